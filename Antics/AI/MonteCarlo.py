@@ -0,0 +1,457 @@
+import random
+import math
+import time
+import sys
+sys.path.append("..")  #so other modules can be found in parent dir
+from Player import *
+from Constants import *
+from Ant import UNIT_STATS
+from Move import Move
+from AIPlayerUtils import *
+from Rules import *
+from PersistentState import makePersistent
+
+#
+# MonteCarlo.py
+#
+# An agent that picks its moves by Monte Carlo tree search (UCT).  Each
+# iteration of the search walks down the tree of moves from the current
+# state, choosing the child with the best UCB1 score at each node, adds one
+# new child and plays the game on from there with a quick scripted policy
+# (see playout).  How that game turned out is credited to every node on the
+# way back up.  The move whose node was visited most often is made.
+#
+# Each node keeps its state as a PersistentState (see PersistentState.py),
+# which shares everything its move didn't change with its parent's, so a node
+# costs little more than the ants its move changed and walking down the tree
+# makes no moves at all.  Only the playouts work on copies of their own.  A
+# playout stops after PLAYOUT_TURNS turns, where the state is scored by food
+# (see scorePlayout), since a whole game played this way takes far too long.
+#
+# The player makes several moves each turn, so after each move the part of
+# the tree below it is kept for the next call to getMove (it is used if that
+# call is given the state the tree expects).
+#
+
+# the fraction of Constants.AI_MOVE_TIMEOUT that getMove spends searching
+TIME_FRACTION = 0.01
+
+# the most iterations getMove will do (None for no limit but the time)
+ITERATION_LIMIT = None
+
+# how much the UCB1 score favours children that have been tried less often
+# (small, since the results of most playouts are close to 0.5)
+EXPLORATION = 0.2
+
+# how many turns (of either player) a playout lasts
+PLAYOUT_TURNS = 8
+
+# how much a playout must gain (in food) for scorePlayout to count it as a win
+PLAYOUT_LEAD = 2.0
+
+# how far (in steps) a worker is from its food or building before it gets no
+# credit for it (see getFoodLead)
+PLAYOUT_DISTANCE = 12.0
+
+# how many workers a player in a playout builds up to
+PLAYOUT_WORKERS = 2
+
+# print how fast the search ran when each game ends
+REPORT_RATE = False
+
+##
+#TreeNode
+#Description: A state in the search tree (the one reached by making the
+#   node's move in its parent's state)
+#
+#Variables:
+#   move - the Move that leads to this node (None at the root)
+#   player - the player that made the move
+#   state - the node's state (a PersistentState)
+#   parent - the parent TreeNode (None at the root)
+#   children - the TreeNodes of the moves tried so far
+#   untried - the legal moves that have no child yet (None until the node
+#       is first expanded)
+#   visits - how many iterations have passed through this node
+#   wins - the total result of those iterations for player (1 for a win, 0
+#       for a loss)
+##
+class TreeNode(object):
+    __slots__ = ('move', 'player', 'state', 'parent', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, player, state, parent):
+        self.move = move
+        self.player = player
+        self.state = state
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+    ##
+    #selectChild
+    #Description: Returns the child with the best UCB1 score (how well its
+    #   move has done plus a bonus for having been tried less often)
+    ##
+    def selectChild(self):
+        logVisits = math.log(self.visits)
+        best = None
+        bestScore = None
+        for child in self.children:
+            score = (child.wins / child.visits +
+                     EXPLORATION * math.sqrt(logVisits / child.visits))
+            if bestScore is None or score > bestScore:
+                best = child
+                bestScore = score
+        return best
+
+    ##
+    #mostVisitedChild
+    #Description: Returns the child that the search tried most often (the
+    #   one with the most wins if there is a tie), or None if there are no
+    #   children
+    ##
+    def mostVisitedChild(self):
+        best = None
+        for child in self.children:
+            if (best is None or child.visits > best.visits or
+                (child.visits == best.visits and child.wins > best.wins)):
+                best = child
+        return best
+
+##
+# getFoodLead
+#
+# Description: Measures how far ahead in food a player is.  A worker's food
+# counts for part of a food by how far it has got:  half a food once it is
+# picked up and a share of the other half as it nears a building.  Without
+# that a playout is too short to tell a move that gets a worker going from
+# one that wastes the turn.
+#
+# Parameters:
+#   state - a GameState
+#   playerId - the player to measure the lead of
+#
+# Return: the player's food less the opponent's (a float)
+def getFoodLead(state, playerId):
+    distTable = getDistanceTable(state)
+    foods = [constr.coords for constr in state.inventories[NEUTRAL].constrs if constr.type == FOOD]
+    food = [0.0, 0.0]
+    for inv in (state.inventories[PLAYER_ONE], state.inventories[PLAYER_TWO]):
+        food[inv.player] = inv.foodCount
+        buildings = [constr.coords for constr in inv.constrs if constr.type in (ANTHILL, TUNNEL)]
+        for ant in inv.ants:
+            if ant.type != WORKER:
+                continue
+            targets = buildings if ant.carrying else foods
+            steps = min([tableSteps(distTable, ant.coords, coords) for coords in targets] + [PLAYOUT_DISTANCE])
+            progress = 0.5 * (PLAYOUT_DISTANCE - steps) / PLAYOUT_DISTANCE
+            if ant.carrying:
+                progress += 0.5
+            food[inv.player] += progress
+    return food[playerId] - food[1 - playerId]
+
+##
+# scorePlayout
+#
+# Description: Scores a state at the end of a playout for a player.  A game
+# that is over is worth 1 or 0;  otherwise the score is how much the player's
+# lead in food (see getFoodLead) has grown since the search began, from 0.5
+# for no change to 1 for PLAYOUT_LEAD food or more (or 0 for as much lost).
+# Scoring the change rather than the lead itself keeps a player that is far
+# ahead or behind from finding every move equally good.
+#
+# Parameters:
+#   state - the state the playout ended in
+#   playerId - the player to score the state for
+#   startLead - the player's lead when the search began
+#
+# Return: a value between 0.0 and 1.0
+def scorePlayout(state, playerId, startLead):
+    if playerHasWon(state, playerId):
+        return 1.0
+    if playerHasWon(state, 1 - playerId):
+        return 0.0
+    change = getFoodLead(state, playerId) - startLead
+    return min(1.0, max(0.0, 0.5 + change / (2.0 * PLAYOUT_LEAD)))
+
+##
+# listTreeMoves
+#
+# Description: Lists the moves the search tries in a state:  the legal moves
+# (one per destination), but no END while an ant can still move.  Moving an
+# ant in place is as good as not moving it (unless it is capturing an enemy
+# building, which only ants that haven't moved do), so ending the turn early
+# gains nothing.  Trying it anyway would have the search compare moves that
+# end the turn, whose results the opponent's mistakes in the tree make look
+# better, with moves that don't, whose results the player's own make look
+# worse.
+#
+# Parameters:
+#   state - the state the moves are for
+#
+# Return: a list of Moves
+def listTreeMoves(state):
+    moves = listAllLegalMoves(state, uniqueDest = True)
+    me = state.whoseTurn
+    for ant in state.inventories[me].ants:
+        constr = findConstrAt(state, ant.coords)
+        if (not ant.hasMoved and constr is not None and
+            constr.type in (ANTHILL, TUNNEL) and constr.player != me):
+            return moves
+    for move in moves:
+        if move.moveType == MOVE_ANT:
+            return [move for move in moves if move.moveType != END]
+    return moves
+
+##
+# playTurn
+#
+# Description: Plays a turn of a playout for the player whose turn it is,
+# the way FoodGatherer would with every worker:  workers carry food from the
+# nearest food to the nearest anthill or tunnel, other ants (but the queen,
+# which stays put) head for the enemy queen, and a new worker is built while
+# there are fewer than PLAYOUT_WORKERS.  The moves are made with the rules in
+# Rules.py without keeping an undo record.
+#
+# Parameters:
+#   state - the playout's state (it is modified)
+def playTurn(state):
+    me = state.whoseTurn
+    myInv = state.inventories[me]
+    enemyQueen = state.inventories[1 - me].getQueen()
+    foods = [constr.coords for constr in state.inventories[NEUTRAL].constrs if constr.type == FOOD]
+    buildings = [constr.coords for constr in myInv.constrs if constr.type in (ANTHILL, TUNNEL)]
+    distTable = getDistanceTable(state)
+
+    numWorkers = 0
+    for ant in list(myInv.ants):
+        if ant.type == WORKER:
+            numWorkers += 1
+        if ant.hasMoved or ant.type == QUEEN:
+            continue
+        if ant.type == WORKER:
+            targets = buildings if ant.carrying else foods
+            if not targets:
+                continue
+            target = min(targets, key=lambda coords: tableSteps(distTable, ant.coords, coords))
+        elif enemyQueen is not None:
+            target = enemyQueen.coords
+        else:
+            continue
+        path = createPathToward(state, ant.coords, target, UNIT_STATS[ant.type][MOVEMENT])
+        applyAntMove(state, Move(MOVE_ANT, path, None))
+        enemies = listAttackTargets(state, ant)
+        if enemies:
+            applyAttack(state, ant, enemies[0])
+
+    anthill = myInv.getAnthill()
+    if (numWorkers < PLAYOUT_WORKERS and myInv.foodCount >= UNIT_STATS[WORKER][COST] and
+        myInv.getAntAt(anthill.coords) is None and
+        state.inventories[1 - me].getAntAt(anthill.coords) is None):
+        applyBuild(state, Move(BUILD, [anthill.coords], WORKER))
+
+    applyEndTurn(state)
+
+##
+# playout
+#
+# Description: Plays the game on from a state for PLAYOUT_TURNS turns (or
+# until someone wins) with playTurn.  The rest of the current turn is played
+# out the same way.
+#
+# Parameters:
+#   state - the state to start from (it isn't changed)
+#   playerId - the player to score the result for
+#   startLead - the player's lead when the search began (see scorePlayout)
+#
+# Return: the result for playerId, between 0.0 and 1.0
+def playout(state, playerId, startLead):
+    state = state.fastclone()
+    #the playout doesn't need the Zobrist key so don't keep it up to date
+    state.hashKey = None
+    for turn in xrange(0, PLAYOUT_TURNS):
+        if playerHasWon(state, PLAYER_ONE) or playerHasWon(state, PLAYER_TWO):
+            break
+        playTurn(state)
+    return scorePlayout(state, playerId, startLead)
+
+
+##
+#AIPlayer
+#Description: The responsbility of this class is to interact with the game by
+#deciding a valid move based on a given game state. This class has methods that
+#will be implemented by students in Dr. Nuxoll's AI course.
+#
+#Variables:
+#   playerId - The id of the player.
+#   timeFraction - the share of AI_MOVE_TIMEOUT to search for
+#   iterationLimit - the most iterations to do for a move (or None)
+#   root - the TreeNode kept from the last move (or None)
+#   startLead - the agent's lead in food when the tree was started
+#   iterations, searchTime - the iterations done and seconds spent on the
+#       last move
+#   totalIterations, totalTime - the same for the whole game
+##
+class AIPlayer(Player):
+
+    #__init__
+    #Description: Creates a new Player
+    #
+    #Parameters:
+    #   inputPlayerId - The id to give the new player (int)
+    ##
+    def __init__(self, inputPlayerId):
+        super(AIPlayer,self).__init__(inputPlayerId, "Monte Carlo")
+        self.timeFraction = TIME_FRACTION
+        self.iterationLimit = ITERATION_LIMIT
+        self.root = None
+        self.startLead = 0.0
+        self.iterations = 0
+        self.searchTime = 0.0
+        self.totalIterations = 0
+        self.totalTime = 0.0
+
+    ##
+    #getPlacement
+    #
+    # The agent uses a hardcoded arrangement for phase 1 to provide maximum
+    # protection to the queen.  Enemy food is placed randomly.
+    #
+    def getPlacement(self, currentState):
+        self.root = None
+        if currentState.phase == SETUP_PHASE_1:
+            return [(0,0), (5, 1),
+                    (0,3), (1,2), (2,1), (3,0), \
+                    (0,2), (1,1), (2,0), \
+                    (0,1), (1,0) ];
+        elif currentState.phase == SETUP_PHASE_2:
+            numToPlace = 2
+            moves = []
+            for i in range(0, numToPlace):
+                move = None
+                while move == None:
+                    #Choose any x location
+                    x = random.randint(0, 9)
+                    #Choose any y location on enemy side of the board
+                    y = random.randint(6, 9)
+                    #Set the move if this space is empty
+                    if currentState.board[x][y].constr == None and (x, y) not in moves:
+                        move = (x, y)
+                moves.append(move)
+            return moves
+        else:
+            return None  #should never happen
+
+    ##
+    #getMove
+    #
+    # Searches until timeFraction of AI_MOVE_TIMEOUT has passed (or
+    # iterationLimit iterations have been done) and makes the move that was
+    # tried most often.  The tree below that move is kept if the turn isn't
+    # over.
+    #
+    ##
+    def getMove(self, currentState):
+        startTime = time.time()
+        deadline = startTime + self.timeFraction * AI_MOVE_TIMEOUT
+
+        #the tree's states share their parts so never use the caller's copy
+        state = makePersistent(currentState)
+        if self.root is None or self.root.state.getHashKey() != state.getHashKey():
+            self.root = TreeNode(None, 1 - state.whoseTurn, state, None)
+            self.startLead = getFoodLead(state, self.playerId)
+
+        iterations = 0
+        while True:
+            self.runIteration()
+            iterations += 1
+            if self.iterationLimit is not None and iterations >= self.iterationLimit:
+                break
+            if time.time() > deadline:
+                break
+
+        best = self.root.mostVisitedChild()
+        if best is None or best.move.moveType == END:
+            self.root = None
+        else:
+            best.parent = None
+            self.root = best
+
+        self.iterations = iterations
+        self.searchTime = time.time() - startTime
+        self.totalIterations += iterations
+        self.totalTime += self.searchTime
+        return Move(END, None, None) if best is None else best.move
+
+    ##
+    #runIteration
+    #
+    # Does one iteration of the search:  walks down the tree to a node that
+    # has untried moves, adds the child of one of them, scores the child with
+    # a playout and credits the result to every node on the way.
+    #
+    def runIteration(self):
+        node = self.root
+
+        #selection:  follow the best children while every move has been tried
+        while node.untried is not None and not node.untried and node.children:
+            node = node.selectChild()
+
+        #expansion:  add one untried move (unless the game is over here)
+        state = node.state
+        if not (playerHasWon(state, PLAYER_ONE) or playerHasWon(state, PLAYER_TWO)):
+            if node.untried is None:
+                node.untried = listTreeMoves(state)
+                random.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                child = TreeNode(move, state.whoseTurn, state.nextState(move), node)
+                node.children.append(child)
+                node = child
+
+        #simulation
+        result = playout(node.state, self.playerId, self.startLead)
+
+        #backpropagation
+        while node is not None:
+            node.visits += 1
+            if node.player == self.playerId:
+                node.wins += result
+            else:
+                node.wins += 1.0 - result
+            node = node.parent
+
+    ##
+    #getIterationRate
+    #
+    # Return: how many iterations a second the search has done this game
+    #
+    def getIterationRate(self):
+        if self.totalTime == 0:
+            return 0.0
+        return self.totalIterations / self.totalTime
+
+    ##
+    #getAttack
+    #
+    # Attacks the first enemy it can (as the search assumes, see applyMove)
+    #
+    def getAttack(self, currentState, attackingAnt, enemyLocations):
+        return enemyLocations[0]
+
+    ##
+    #registerWin
+    #
+    # This agent doesn't learn.  If REPORT_RATE is set it reports how fast the
+    # search ran (to help size timeFraction and iterationLimit for the machine
+    # it runs on).
+    #
+    def registerWin(self, hasWon):
+        if REPORT_RATE:
+            print "%s: %d iterations in %.1f s (%.0f a second)" % \
+                (self.author, self.totalIterations, self.totalTime, self.getIterationRate())
+        self.root = None
+        self.totalIterations = 0
+        self.totalTime = 0.0
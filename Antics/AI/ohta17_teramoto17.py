@@ -8,7 +8,61 @@ from Ant import *
 from Move import Move
 from GameState import *
 from AIPlayerUtils import *
+from TranspositionTable import *
+from BatchFeatures import *
+from EvaluationCache import *
+from CompactState import compactClone
 import time
+import multiprocessing
+
+# the number of entries in the transposition table the search uses
+TABLE_SIZE = 1 << 14
+
+# keep the values of the states alphaBeta stops at from one move to the next
+# (see EvaluationCache).  Off by default:  looking values up costs more than
+# working them out with FoodEvaluator saves.
+USE_EVAL_CACHE = False
+
+# the most leaf values the cache keeps
+EVAL_CACHE_LIMIT = 1 << 15
+
+# print how often the evaluation cache had a value when each game ends
+REPORT_CACHE = False
+
+# the fraction of Constants.AI_MOVE_TIMEOUT that getMove spends searching
+TIME_FRACTION = 0.01
+
+# the kinds of moves listSearchMoves lists, in order (see iterLegalMoves)
+SEARCH_MOVE_ORDER = (ATTACK_MOVES, FOOD_MOVES, QUIET_MOVES, END_MOVE)
+
+# what getStateValues uses for the steps to a target a worker doesn't head for
+NO_TARGET = 1 << 16
+
+# the points a player has with FOOD_GOAL food (see getStateValue)
+MAX_POINTS = 264
+
+# the cells getFoodPoints looks for food in (see getStateValues), for a
+# player whose anthill is on the top half of the board and for one whose
+# anthill is on the bottom half
+if HAVE_NUMPY:
+    NEAR_FOOD_CELLS = {True: cellMask(lambda coords: coords[1] < BOARD_LENGTH / 2),
+                       False: cellMask(lambda coords: coords[1] >= BOARD_LENGTH / 2)}
+
+# how many processes getMove searches in (see searchParallel).  With fewer
+# than 2 it searches in the game's process, which is the default:  the pool
+# is forked from under the game's UI, so using it should be a choice.  Set
+# this to the number of cores (multiprocessing.cpu_count()) to use all of them.
+# That it then searches more nodes in the same time is unverified:  it has
+# only been run on a single core, where the workers just take turns.
+PARALLEL_WORKERS = 1
+
+##
+#SearchTimeout
+#Description: Raised by alphaBeta when the agent's deadline has passed, to
+#   abandon the search in progress (see deepenSearch)
+##
+class SearchTimeout(Exception):
+    pass
 
 ##
 #getFoodCost
@@ -45,6 +99,32 @@ def getFoodCost(antList):
 
     return cost
 
+##
+#listNearFood
+#
+#Description: Lists the food a player's workers go for:  the food on the
+# player's own half of the board (each player's food is put on the other
+# player's side, see getPlacement), which is the half with its anthill
+#
+#Parameters:
+#   currentState - the state of the game
+#   playerId - the player whose food to list
+#
+#Return: a list of the food Constructions
+##
+def listNearFood(currentState, playerId):
+    onTop = isOnTop(currentState, playerId)
+    return [food for food in getConstrList(currentState, None, (FOOD,))
+            if (food.coords[1] < BOARD_LENGTH / 2) == onTop]
+
+##
+#isOnTop
+#
+#Return: True if the given player's anthill is on the top half of the board
+##
+def isOnTop(currentState, playerId):
+    return currentState.inventories[playerId].getAnthill().coords[1] < BOARD_LENGTH / 2
+
 ##
 #getFoodPoints
 #
@@ -64,23 +144,23 @@ def getFoodPoints(self, currentState, myId):
     foodInvWeight = 24
     heldFoodWeight = 12
 
-    myGameState = currentState.fastclone()
-
     # get values for the workers and constructs that I need to calc points
-    myFoodPoints = myGameState.inventories[myId].foodCount * 24
+    myFoodPoints = currentState.inventories[myId].foodCount * 24
     myWorkers = getAntList(currentState, myId, (WORKER,))
-    myFoodOnBoard = getConstrList(currentState, None, (FOOD,))
-    myFoodOnBoard = [x for x in myFoodOnBoard if x.coords[1] <= 3]
+    myFoodOnBoard = listNearFood(currentState, myId)
     myTunnelAndAnthill = getConstrList(currentState, myId, (TUNNEL, ANTHILL))
+    # true (grass-aware) distances, read from a table built once per game
+    distTable = getDistanceTable(currentState)
 
     # give points based on worker position and whether they are holding food
     for worker in myWorkers:
         if not worker.carrying:
             distances = []
-            # don't look at food that's covered
-            applicableFood = [food for food in myFoodOnBoard if (getAntAt(currentState, food.coords) is None)]
+            # don't look at food that's covered (by another ant: a worker
+            # standing on food picks it up when the turn ends)
+            applicableFood = [food for food in myFoodOnBoard if (getAntAt(currentState, food.coords) in (None, worker))]
             for food in applicableFood:
-                distances.append(approxDist(worker.coords, food.coords))
+                distances.append(tableSteps(distTable, worker.coords, food.coords))
 
             factor = 12
             if distances:
@@ -90,11 +170,11 @@ def getFoodPoints(self, currentState, myId):
 
         else: # worker is carrying food 
             distances = []
-            # don't look at anthill/tunnels that are covered
+            # don't look at anthill/tunnels that are covered (by another ant)
             applicableTunnelHills = [construct for construct in myTunnelAndAnthill if \
-                                     (getAntAt(currentState, construct.coords) is None)]
+                                     (getAntAt(currentState, construct.coords) in (None, worker))]
             for construct in applicableTunnelHills:
-                distances.append(approxDist(worker.coords, construct.coords))
+                distances.append(tableSteps(distTable, worker.coords, construct.coords))
 
             # if both anthill and tunnel are covered, skip
             factor = 12
@@ -105,6 +185,23 @@ def getFoodPoints(self, currentState, myId):
             
     return myFoodPoints
 
+##
+#scaleValue
+#
+#Description: Turns the points of both players (see getFoodPoints) into a
+#   value between 0.0 and 1.0:  0.5 when they are even, more the further
+#   ahead the agent is and less the further behind.
+#
+#Parameters:
+#   myPoints - the agent's points
+#   otherPoints - its opponent's points
+#
+#Return: The value
+##
+def scaleValue(myPoints, otherPoints):
+    value = 0.5 + (myPoints - otherPoints) / (2.0 * MAX_POINTS)
+    return min(max(value, 0.0), 1.0)
+
 ##
 #getStateValue
 #
@@ -130,134 +227,733 @@ def getStateValue(self, currentState):
     # get points for each player
     myPoints = getFoodPoints(self, currentState, myId)
     otherPoints = getFoodPoints(self, currentState, otherId)
-    #otherPoints = currentState.inventories[otherId].foodCount
     myFoodCount = currentState.inventories[myId].foodCount
     otherFoodCount = currentState.inventories[otherId].foodCount
-    totalPoints = myPoints + otherPoints
 
     # handle win/lose conditions
     if myFoodCount == 11:
         return 1
     if otherFoodCount == 11:
         return 0
-    # scale the point values
-    maxPoints = 264 # possible points for having 11 food
-    return (myPoints / float(maxPoints))
+    # the agent's lead in points, scaled
+    return scaleValue(myPoints, otherPoints)
+
+##
+#getBatchPoints
+#
+#Description: getFoodPoints for a batch of states at once (see
+#   BatchFeatures.py), scoring every worker in the batch with NumPy array
+#   operations.  Only call it when HAVE_NUMPY is True.
+#
+#Parameters:
+#   batch - a StateBatch encoded for the player to score
+#   distTable - the distance table of the states (see getDistanceTable)
+#   nearFood - the cells the player's workers look for food in (see
+#       NEAR_FOOD_CELLS)
+#
+#Return: a NumPy array of the points of the player in each state
+##
+def getBatchPoints(batch, distTable, nearFood):
+    rows = batch.workerStates
+    cells = batch.workerCells
+    carrying = batch.workerCarrying
+
+    # the food and buildings each worker heads for, as in getFoodPoints:
+    # leaving out any that another ant is standing on
+    targets = numpy.where(carrying[:, None], batch.buildings[rows],
+                          batch.food[rows] & nearFood)
+    free = ~batch.ants[rows]
+    free[numpy.arange(len(cells)), cells] = True
+    targets &= free
+
+    # steps from each worker to each of its targets
+    steps = numpy.where(targets, distanceMatrix(distTable)[:, cells].T, NO_TARGET)
+    factors = steps.min(axis=1)
+    factors[factors == NO_TARGET] = 12
+    points = 12 - factors + 12 * carrying
+
+    return batch.foodCounts[:, batch.playerId] * 24 + \
+        numpy.bincount(rows, weights=points, minlength=batch.size)
+
+##
+#getStateValues
+#
+#Description: getStateValue for a batch of states at once, scoring both
+#   players with getBatchPoints.  Only call it when HAVE_NUMPY is True.
+#
+#Parameters:
+#   batches - the StateBatch of the states encoded for each player (indexed
+#       by player id)
+#   distTable - the distance table of the states (see getDistanceTable)
+#   onTop - whether each player's anthill is on the top half of the board
+#       (see isOnTop)
+#
+#Return: a list of the value of each state
+##
+def getStateValues(self, batches, distTable, onTop):
+    myId = self.playerId
+    otherId = 1 - myId
+    myPoints = getBatchPoints(batches[myId], distTable, NEAR_FOOD_CELLS[onTop[myId]])
+    otherPoints = getBatchPoints(batches[otherId], distTable, NEAR_FOOD_CELLS[onTop[otherId]])
+    values = numpy.clip(0.5 + (myPoints - otherPoints) / (2.0 * MAX_POINTS), 0.0, 1.0)
+    foodCounts = batches[myId].foodCounts
+    values[foodCounts[:, otherId] == 11] = 0
+    values[foodCounts[:, myId] == 11] = 1
+    return values.tolist()
+
+##
+#FoodEvaluator
+#Description: Keeps the points getFoodPoints gives a player up to date as
+#   moves are made and taken back during a search, so that a state can be
+#   valued without looking at every worker, food and building again.  Most
+#   moves only change the points of the ant that moved (if it is one of the
+#   player's workers);  the points of every worker are worked out again only
+#   when an ant steps onto or off food or a building (which can block a
+#   worker's way to it) and at BUILDs and ENDs.
+#
+#   The evaluator must see every move made on its state (see iterChildren).
+#
+#Variables:
+#   playerId - the player whose points are kept
+#   distTable - the distance table of the board (see getDistanceTable)
+#   foodCells - the food getFoodPoints looks at
+#   buildingCells - the player's anthill and tunnels
+#   occupant - the ant on each of those cells (or None)
+#   workerPoints - the points of each of the player's workers
+#   workerTotal - the sum of workerPoints
+#   history - what each move changed (to take it back with pop)
+##
+class FoodEvaluator(object):
+    __slots__ = ('playerId', 'distTable', 'foodCells', 'buildingCells', 'occupant',
+                 'workerPoints', 'workerTotal', 'history')
+
+    ##
+    #__init__
+    #Description: Works out the points of a player in a state from scratch
+    #
+    #Parameters:
+    #   state - the state the search will work on
+    #   playerId - the player to keep the points of
+    ##
+    def __init__(self, state, playerId):
+        self.playerId = playerId
+        self.distTable = getDistanceTable(state)
+        self.history = []
+        self.scoreAll(state)
+
+    ##
+    #scoreAll
+    #Description: Works out every worker's points (and the cells they depend
+    #   on) from scratch
+    ##
+    def scoreAll(self, state):
+        self.foodCells = [food.coords for food in listNearFood(state, self.playerId)]
+        self.buildingCells = [constr.coords for constr in
+                              getConstrList(state, self.playerId, (TUNNEL, ANTHILL))]
+        self.occupant = {}
+        for coords in self.foodCells + self.buildingCells:
+            self.occupant[coords] = getAntAt(state, coords)
+        self.workerPoints = {}
+        self.workerTotal = 0
+        for worker in getAntList(state, self.playerId, (WORKER,)):
+            points = self.scoreWorker(worker)
+            self.workerPoints[worker] = points
+            self.workerTotal += points
+
+    ##
+    #scoreWorker
+    #Description: Returns the points getFoodPoints gives a worker
+    ##
+    def scoreWorker(self, worker):
+        if worker.carrying:
+            cells = self.buildingCells
+            points = 12
+        else:
+            cells = self.foodCells
+            points = 0
+        factor = None
+        for coords in cells:
+            if self.occupant[coords] in (None, worker):
+                steps = tableSteps(self.distTable, worker.coords, coords)
+                if factor is None or steps < factor:
+                    factor = steps
+        if factor is None:
+            factor = 12
+        return points + 12 - factor
+
+    ##
+    #setPoints
+    #Description: Changes the points of a worker (None to remove it),
+    #   logging the old points in an undo list
+    ##
+    def setPoints(self, worker, points, undo):
+        old = self.workerPoints.get(worker)
+        undo.append((worker, old))
+        if old is not None:
+            self.workerTotal -= old
+            del self.workerPoints[worker]
+        if points is not None:
+            self.workerTotal += points
+            self.workerPoints[worker] = points
+
+    ##
+    #push
+    #Description: Brings the points up to date after a move
+    #
+    #Parameters:
+    #   state - the state after the move
+    #   move - the move
+    #   record - the undo record applyMove returned for it
+    ##
+    def push(self, state, move, record):
+        if move.moveType != MOVE_ANT:
+            # BUILDs and ENDs can change every worker (and the buildings) but
+            # there is only one END a turn, so just start again
+            self.history.append((self.foodCells, self.buildingCells, self.occupant,
+                                 self.workerPoints, self.workerTotal))
+            self.scoreAll(state)
+            return
+
+        # the record notes which ant moved from where and which ant (if any)
+        # its attack killed (see the ANT_MOVED and ANT_REMOVED entries in
+        # Rules.py)
+        movedAnt = None
+        deadAnt = None
+        for entry in record:
+            if entry[0] == ANT_MOVED:
+                movedAnt, src = entry[1], entry[2]
+            elif entry[0] == ANT_REMOVED:
+                deadAnt = entry[1]
+
+        occupantUndo = []
+        if movedAnt is not None and src != movedAnt.coords:
+            if src in self.occupant:
+                occupantUndo.append((src, self.occupant[src]))
+                self.occupant[src] = None
+            if movedAnt.coords in self.occupant:
+                occupantUndo.append((movedAnt.coords, self.occupant[movedAnt.coords]))
+                self.occupant[movedAnt.coords] = movedAnt
+        if deadAnt is not None and deadAnt.coords in self.occupant:
+            occupantUndo.append((deadAnt.coords, self.occupant[deadAnt.coords]))
+            self.occupant[deadAnt.coords] = None
+
+        pointsUndo = []
+        if deadAnt is not None and deadAnt in self.workerPoints:
+            self.setPoints(deadAnt, None, pointsUndo)
+        if occupantUndo:
+            # a worker's way to food or a building may have opened or closed
+            for worker in self.workerPoints.keys():
+                self.setPoints(worker, self.scoreWorker(worker), pointsUndo)
+        elif movedAnt in self.workerPoints:
+            self.setPoints(movedAnt, self.scoreWorker(movedAnt), pointsUndo)
+        self.history.append((occupantUndo, pointsUndo))
+
+    ##
+    #pop
+    #Description: Takes back what the last push did
+    ##
+    def pop(self):
+        entry = self.history.pop()
+        if len(entry) == 5:
+            (self.foodCells, self.buildingCells, self.occupant,
+             self.workerPoints, self.workerTotal) = entry
+            return
+        occupantUndo, pointsUndo = entry
+        for worker, points in reversed(pointsUndo):
+            self.setPoints(worker, points, [])
+        for coords, ant in reversed(occupantUndo):
+            self.occupant[coords] = ant
+
+    ##
+    #getPoints
+    #Description: Returns what getFoodPoints would for the player in the state
+    ##
+    def getPoints(self, state):
+        return state.inventories[self.playerId].foodCount * 24 + self.workerTotal
+
+##
+#iterChildren
+#
+#Description: Makes each of a list of moves in turn on the state the agent is
+#   searching (see iterNextStates), keeping its FoodEvaluators (if it has
+#   them) up to date.  A move is taken back when the next one is asked for or
+#   the generator is closed.
+#
+#Parameters:
+#   state - a GameState object (changed while the moves are tried)
+#   moves - the moves to make from it
+#
+#Return: a generator of the moves, each yielded while it is made
+##
+def iterChildren(self, state, moves):
+    evaluators = self.evaluators
+    children = iterNextStates(state, moves)
+    try:
+        for move, child, record in children:
+            if evaluators is not None:
+                for evaluator in evaluators:
+                    evaluator.push(child, move, record)
+            try:
+                yield move
+            finally:
+                if evaluators is not None:
+                    for evaluator in evaluators:
+                        evaluator.pop()
+    finally:
+        children.close()
+
+##
+#evaluate
+#
+#Description: Returns the value of the state the agent is searching (see
+#   getStateValue), from its FoodEvaluators if it has them.
+##
+def evaluate(self, state):
+    if self.evaluators is None:
+        return getStateValue(self, state)
+    myId = self.playerId
+    if state.inventories[myId].foodCount == 11:
+        return 1
+    if state.inventories[1 - myId].foodCount == 11:
+        return 0
+    return scaleValue(self.evaluators[myId].getPoints(state),
+                      self.evaluators[1 - myId].getPoints(state))
 
 ##
-#searchTree
+#evaluateLeaf
 #
-#Description: Given a state and the current depth, get all possible moves and states that result
-# from each move. Assess the overall value of each list of nodes.
+#Description: Returns the value alphaBeta gives a state when it searches no
+#   deeper:  1.0 or 0.0 if a player has won and otherwise its value (see
+#   evaluate).  Values are kept in the agent's EvaluationCache (if it has
+#   one), which lasts from one move to the next.
 #
 #Parameters:
 #   state - a GameState object
-#   depth - the current depth
-#   depthLim - the depth limit that determines when we stop searching into the future
-#   node - the current node being passed down
-#
-#Return: The overall value of the entire list of nodes
-##
-def searchTree(self, state, depth, depthLim, node = None):
-    # generate a list of all possible moves that could be made from the given state
-    allMoves = listAllLegalMoves(state)
-
-    # ignore moves that involve the queen
-    queenCoord = getAntList(state, self.playerId, (QUEEN,))[0].coords
-    allMoves = [x for x in allMoves if (x.moveType == MOVE_ANT and (queenCoord not in x.coordList))]
-
-    if node is None:
-        node = Node()
-
-    # discard the END_TURN move
-    endTurnMove = Move(END, None, None)
-    if endTurnMove in allMoves:
-        allMoves.remove(endTurnMove)
-
-    # generate a list of GameState objects that will result from making each move
-    allChildren = []
-    for move in allMoves:
-        newState = getNextState(state, move)
-        newStateVal = getStateValue(self, newState)
-        newNode = Node(move, newState, node, newStateVal)
-        allChildren.append(newNode)
-
-    # sort children by value
-    allChildren.sort(key=lambda x: x.val, reverse=True)
-
-    # recursive case: if the depth limit has not been reached, make a recursive
-    # call for each state in the list and use the result of the call as the new value
-    # for this node
-    if depth < depthLim:
-        # search the first 1/3 of children
-        childLim = len(allChildren) / 3
-        
-        for child in allChildren[:childLim]:
-            child.val = searchTree(self, child.state, depth + 1, depthLim, node)
+#   key - the state's Zobrist key
+#
+#Return: the value of the state
+##
+def evaluateLeaf(self, state, key):
+    cache = self.evalCache
+    value = None if cache is None else cache.lookup(key, self.playerId)
+    if value is None:
+        if playerHasWon(state, self.playerId):
+            value = 1.0
+        elif playerHasWon(state, 1 - self.playerId):
+            value = 0.0
+        else:
+            value = evaluate(self, state)
+        if cache is not None:
+            cache.store(key, self.playerId, value)
+    return value
 
+##
+#evaluateLeaves
+#
+#Description: evaluateLeaf for the state after each of a list of moves.  The
+#   states whose values aren't cached are encoded as they are visited (see
+#   ChildEncoder) and valued all at once with NumPy (see getStateValues).
+#   Only call it when HAVE_NUMPY is True.
+#
+#Parameters:
+#   state - a GameState object (changed while the moves are tried)
+#   moves - the moves to make from it
+#
+#Return: a list of the value after each move, in the same order
+##
+def evaluateLeaves(self, state, moves):
+    cache = self.evalCache
+    # both players' workers are scored (see getStateValues)
+    encoders = (ChildEncoder(state, PLAYER_ONE), ChildEncoder(state, PLAYER_TWO))
+    values = [None] * len(moves)
+    # the index, key and value (if a player has won) of each child encoded
+    missed = []
+    # the children are made in one pass, sharing the work on the parent (see
+    # iterNextStates)
+    children = iterNextStates(state, moves)
+    for index, (move, child, record) in enumerate(children):
+        key = child.getHashKey()
+        if cache is not None:
+            values[index] = cache.lookup(key, self.playerId)
+        if values[index] is None:
+            # only a child that isn't its parent with an ant moved can have
+            # been won (the parent hasn't been, see alphaBeta)
+            value = None
+            encoders[PLAYER_TWO].add(child, record)
+            if not encoders[PLAYER_ONE].add(child, record):
+                if playerHasWon(child, self.playerId):
+                    value = 1.0
+                elif playerHasWon(child, 1 - self.playerId):
+                    value = 0.0
+            missed.append((index, key, value))
 
-    # assess overall value of entire list of nodes
-    overallVal = findOverallScore(allChildren)
-    
-    #print "overall val at depth " + str(depth) + ": " + str(overallVal)
-    
-    # return the overall value if depth > 0
-    if depth > 0:
-        return overallVal
-    # otherwise, return the Move object from the node that has the
-    # highest evaluation score
+    batches = [encoder.finish() for encoder in encoders]
+    newValues = getStateValues(self, batches, getDistanceTable(state),
+                               (isOnTop(state, PLAYER_ONE), isOnTop(state, PLAYER_TWO)))
+    for (index, key, value), newValue in zip(missed, newValues):
+        if value is None:
+            value = newValue
+        values[index] = value
+        if cache is not None:
+            cache.store(key, self.playerId, value)
+    return values
+
+##
+#listSearchMoves
+#
+#Description: Lists the moves alphaBeta considers for the player whose turn it
+#   is:  the moves of every ant but the queen (only one per destination) and
+#   END.  It never considers building.  The moves come from iterLegalMoves,
+#   so attacks come first, then moves that take a worker to food or home and
+#   then the rest (which is the order orderMoves keeps moves that look
+#   equally good in).
+#
+#Parameters:
+#   state - a GameState object
+#
+#Return: a list of Moves
+##
+def listSearchMoves(state):
+    queenCoord = getCurrPlayerQueen(state).coords
+    return [move for move in iterLegalMoves(state, SEARCH_MOVE_ORDER, uniqueDest=True)
+            if move.moveType == END or
+            (move.moveType == MOVE_ANT and queenCoord not in move.coordList)]
+
+##
+#sameMove
+#
+#Description: Tells whether two Moves are the same move.  Move has no __eq__
+#   and the moves are listed afresh for each search, so the move a table
+#   entry holds is never the same object as the one listed for it.
+#
+#Parameters:
+#   move1, move2 - Moves
+#
+#Return: True if the moves have the same type, path and build type
+##
+def sameMove(move1, move2):
+    return (move1.moveType == move2.moveType and move1.buildType == move2.buildType and
+            move1.coordList == move2.coordList)
+
+##
+#orderMoves
+#
+#Description: Sorts moves so that the ones that look best for the player
+#   making them come first (which is what makes alpha-beta cut off early).
+#   Each move is judged by the value of the state it leads to (see
+#   getStateValue);  moves of the same value keep their order (see
+#   listSearchMoves).  The best move found by an earlier search of the
+#   state, if there is one, goes first.
+#
+#Parameters:
+#   state - a GameState object
+#   moves - the moves to sort
+#   maximizing - True if it is this agent's turn
+#   firstMove - the move to put first (or None)
+#
+#Return: a sorted list of Moves
+##
+def orderMoves(self, state, moves, maximizing, firstMove):
+    scored = []
+    for move in iterChildren(self, state, moves):
+        scored.append((evaluate(self, state), move))
+    scored.sort(key=lambda x: x[0], reverse=maximizing)
+    ordered = [move for value, move in scored]
+    if firstMove is not None:
+        for i in xrange(0, len(ordered)):
+            if sameMove(ordered[i], firstMove):
+                ordered.insert(0, ordered.pop(i))
+                break
+    return ordered
+
+##
+#alphaBeta
+#
+#Description: Finds the value of a state by minimax search with alpha-beta
+#   pruning.  The search alternates between the players as END moves pass
+#   the turn:  this agent picks the move with the highest value and its
+#   opponent the one with the lowest.  Moves are made and taken back on the
+#   single state passed in (see iterChildren) and results are kept in the
+#   agent's transposition table.
+#
+#Parameters:
+#   state - a GameState object (which is restored before this returns)
+#   depth - how many more moves to search
+#   alpha - the value this agent is already sure of getting
+#   beta - the value the opponent is already sure of holding this agent to
+#
+#Return: the value of the state
+##
+def alphaBeta(self, state, depth, alpha, beta):
+    if self.deadline is not None and time.time() > self.deadline:
+        raise SearchTimeout()
+    self.nodeCount += 1
+
+    # use what an earlier search of this state found if it is good enough
+    key = state.getHashKey()
+    entry = self.transpositionTable.lookup(key)
+    bestFirst = None
+    if entry is not None:
+        if entry.depth >= depth:
+            if entry.bound == EXACT:
+                return entry.value
+            if entry.bound == LOWER_BOUND and entry.value >= beta:
+                return entry.value
+            if entry.bound == UPPER_BOUND and entry.value <= alpha:
+                return entry.value
+        bestFirst = entry.move
+
+    # the search has gone deep enough or the game is over
     if depth == 0:
-        if len(allChildren) == 0:
-            return endTurnMove
-        highestEvalScore = max([child.val for child in allChildren])
-        childrenWithHighestScore = [child for child in allChildren if (child.val == highestEvalScore)]
-        # shuffle all ties for highest score
-        random.shuffle(childrenWithHighestScore)
-        return childrenWithHighestScore[0].move
-
-##
-#Node
-#Description: Creates a class that will represent a node in the
-#   search tree. The node references the parent node. A move that
-#   can be taken from the parent node. The state of the game after
-#   the move is finished. The value of the state that was just reached.
-#
-##
-class Node(object):
-    def __init__(self, newMove = None, newState = None, newParent = None, newVal = None):
-        self.move = newMove
-        self.state = newState
-        self.parent = newParent
-        self.val = newVal
-
-    def __str__(self):
-        return str(self.move)
-    
+        return evaluateLeaf(self, state, key)
+    if playerHasWon(state, self.playerId):
+        return 1.0
+    if playerHasWon(state, 1 - self.playerId):
+        return 0.0
+
+    maximizing = state.whoseTurn == self.playerId
+    moves = listSearchMoves(state)
+    # the children of the last level are evaluated anyway so don't sort them
+    if depth > 1:
+        moves = orderMoves(self, state, moves, maximizing, bestFirst)
+
+    origAlpha = alpha
+    origBeta = beta
+    bestVal = None
+    bestMove = None
+    if depth == 1 and HAVE_NUMPY:
+        # the children are all leaves:  value them at once
+        values = evaluateLeaves(self, state, moves)
+        self.nodeCount += len(moves)
+        if maximizing:
+            bestVal = max(values)
+        else:
+            bestVal = min(values)
+        bestMove = moves[values.index(bestVal)]
+        moves = []
+    children = iterChildren(self, state, moves)
+    for move in children:
+        val = alphaBeta(self, state, depth - 1, alpha, beta)
+        if maximizing:
+            if bestVal is None or val > bestVal:
+                bestVal = val
+                bestMove = move
+            alpha = max(alpha, val)
+        else:
+            if bestVal is None or val < bestVal:
+                bestVal = val
+                bestMove = move
+            beta = min(beta, val)
+        if alpha >= beta:
+            break   # the other player won't let the game get here
+    # take back the move the search stopped at
+    children.close()
+
+    if bestVal <= origAlpha:
+        bound = UPPER_BOUND
+    elif bestVal >= origBeta:
+        bound = LOWER_BOUND
+    else:
+        bound = EXACT
+    self.transpositionTable.store(key, depth, bestVal, bound, bestMove)
+    return bestVal
+
 ##
-#findOverallScore
-#Description: called to evaluate the score of a list of nodes.
+#searchAlphaBeta
+#
+#Description: Picks a move for the player whose turn it is in the given state
+#   by searching it with alphaBeta.
 #
 #Parameters:
-#   nodeList - The list of nodes down a ceratin path
+#   state - a GameState object (it isn't changed)
+#   depth - how many moves deep to search
+#   moves - the moves to choose from (all of them, see listSearchMoves, if
+#       None)
+#
+#Return: the Move to make and its value
 ##
-def findOverallScore(nodeList):
+def searchAlphaBeta(self, state, depth, moves = None):
+    # the search modifies the state so never touch the caller's copy
+    state = state.fastclone()
+    if moves is None:
+        moves = listSearchMoves(state)
+    entry = self.transpositionTable.lookup(state.getHashKey())
+    bestFirst = None if entry is None else entry.move
+    self.evaluators = (FoodEvaluator(state, PLAYER_ONE), FoodEvaluator(state, PLAYER_TWO))
+    try:
+        moves = orderMoves(self, state, moves, True, bestFirst)
 
-    if len(nodeList) == 0:
-        return 0
-    
-    #iterate through the list
-    #take the nodes value from getStateValue
-    #average the scores of all the nodes
-    total = 0
-    for node in nodeList:
-        sub = total
-        score = node.val
-        total = score + sub
-    avg = (total)/(len(nodeList))
+        alpha = -1.0
+        bestMove = moves[0]
+        for move in iterChildren(self, state, moves):
+            val = alphaBeta(self, state, depth - 1, alpha, 2.0)
+            if val > alpha:
+                alpha = val
+                bestMove = move
+    finally:
+        self.evaluators = None
+    self.transpositionTable.store(state.getHashKey(), depth, alpha, LOWER_BOUND, bestMove)
+    return bestMove, alpha
 
-    # return max instead
-    return max([x.val for x in nodeList])
-    #return avg
+##
+#deepenSearch
+#
+#Description: Searches a state by iterative deepening:  with searchAlphaBeta
+#   to a depth of 1, then 2, 3 and so on until the deadline passes.  The
+#   search that is going on then is abandoned.  Each search tries the moves
+#   the one before it found best first (they are kept in the transposition
+#   table), which makes up for most of the repeated work.
+#
+#Parameters:
+#   state - a GameState object (it isn't changed)
+#   deadline - when to stop (a time.time() value)
+#   moves - the moves to choose from (or None for all of them)
+#
+#Return: a list of the move each search that finished picked and its value
+#   (the search to a depth of d is entry d - 1).  The depth 1 search always
+#   finishes so there is at least one.
+##
+def deepenSearch(self, state, deadline, moves = None):
+    results = [searchAlphaBeta(self, state, 1, moves)]
+    self.deadline = deadline
+    try:
+        depth = 2
+        while True:
+            results.append(searchAlphaBeta(self, state, depth, moves))
+            depth += 1
+    except SearchTimeout:
+        pass
+    finally:
+        self.deadline = None
+    return results
+
+##
+#searchIterative
+#
+#Description: Picks a move by iterative deepening (see deepenSearch):  the
+#   move the deepest search that finished within the time limit picked.
+#
+#Parameters:
+#   state - a GameState object (it isn't changed)
+#   timeLimit - how long to search (in seconds)
+#
+#Return: the Move to make
+##
+def searchIterative(self, state, timeLimit):
+    results = deepenSearch(self, state, time.time() + timeLimit)
+    self.searchDepth = len(results)
+    return results[-1][0]
+
+##
+#searchParallel
+#
+#Description: Picks a move by searching the state in the agent's worker
+#   processes (see getSearchPool).  The moves are sorted as orderMoves sorts
+#   them and dealt out to the workers in turn, so each gets a share of the
+#   promising ones, and every worker searches its share by iterative
+#   deepening (see searchRootMoves).  The move picked is the best any worker
+#   found at the deepest depth they all finished.
+#
+#Parameters:
+#   state - a GameState object (it isn't changed)
+#   timeLimit - how long to search (in seconds)
+#
+#Return: the Move to make
+##
+def searchParallel(self, state, timeLimit):
+    deadline = time.time() + timeLimit
+    # a state without a board is quicker to send to the workers
+    state = state.fastclone()
+    moves = orderMoves(self, state, listSearchMoves(state), True, None)
+    numTasks = min(self.numWorkers, len(moves))
+    if numTasks < 2:
+        return searchIterative(self, state, deadline - time.time())
+
+    # a CompactState pickles as one buffer (see CompactState.py)
+    compact = compactClone(state)
+    tasks = []
+    for i in xrange(0, numTasks):
+        tasks.append((compact, self.playerId, moves[i::numTasks], deadline))
+    replies = getSearchPool(self).map(searchRootMoves, tasks)
+
+    depth = min([len(reply[0]) for reply in replies])
+    best = max([reply[0][depth - 1] for reply in replies], key=lambda x: x[1])
+    self.searchDepth = depth
+    for results, nodeCount, hits, misses in replies:
+        self.nodeCount += nodeCount
+        # the workers' caches count toward the agent's
+        if self.evalCache is not None:
+            self.evalCache.hits += hits
+            self.evalCache.misses += misses
+    return best[0]
+
+##
+#getSearchPool
+#
+#Description: Returns the agent's pool of numWorkers worker processes,
+#   starting it the first time it is needed.  The processes are kept (with
+#   their transposition tables) until the game ends or a new one starts (see
+#   closeSearchPool).
+##
+def getSearchPool(self):
+    if self.searchPool is None:
+        self.searchPool = multiprocessing.Pool(self.numWorkers, initSearchWorker)
+    return self.searchPool
+
+##
+#closeSearchPool
+#
+#Description: Stops the agent's worker processes (if it has started them)
+#   and waits for them to exit.
+##
+def closeSearchPool(self):
+    if self.searchPool is not None:
+        self.searchPool.terminate()
+        self.searchPool.join()
+        self.searchPool = None
+
+# the agent a worker process searches with (see initSearchWorker)
+searchWorker = None
+
+##
+#initSearchWorker
+#
+#Description: Sets up a worker process of the search pool.  It searches with
+#   an agent of its own, so it has a transposition table of its own.
+##
+def initSearchWorker():
+    global searchWorker
+    searchWorker = AIPlayer(0)
+
+##
+#searchRootMoves
+#
+#Description: Searches some of the moves of a state by iterative deepening
+#   (see deepenSearch) in a worker process of the search pool.
+#
+#Parameters:
+#   task - the state (a CompactState), the id of the player whose move it
+#       is, the moves to search and the deadline
+#
+#Return: the results of deepenSearch, how many nodes were searched and how
+#   many lookups in the worker's evaluation cache hit and missed (0 and 0
+#   without a cache)
+##
+def searchRootMoves(task):
+    compact, playerId, moves, deadline = task
+    # the search changes the state it searches in place, which a GameState
+    # is quicker at than a CompactState
+    state = compact.toGameState()
+    searchWorker.playerId = playerId
+    searchWorker.transpositionTable.clear()
+    searchWorker.nodeCount = 0
+    cache = searchWorker.evalCache
+    if cache is None:
+        results = deepenSearch(searchWorker, state, deadline, moves)
+        return (results, searchWorker.nodeCount, 0, 0)
+    cache.resetCounters()
+    results = deepenSearch(searchWorker, state, deadline, moves)
+    return (results, searchWorker.nodeCount, cache.hits, cache.misses)
 
 ##
 #AIPlayer
@@ -278,6 +974,26 @@ class AIPlayer(Player):
     ##
     def __init__(self, inputPlayerId):
         super(AIPlayer,self).__init__(inputPlayerId, "Ohta_Teramoto AI")
+        # values of the states searched for the current move (see alphaBeta)
+        self.transpositionTable = TranspositionTable(TABLE_SIZE)
+        # values of the states alphaBeta stopped at (for any move; the
+        # player is part of the key so they never need clearing), or None
+        self.evalCache = None
+        if USE_EVAL_CACHE:
+            self.evalCache = EvaluationCache(EVAL_CACHE_LIMIT)
+        # the share of AI_MOVE_TIMEOUT to search for, when alphaBeta must stop
+        # (None when it needn't) and the depth the last search finished
+        self.timeFraction = TIME_FRACTION
+        self.deadline = None
+        self.searchDepth = 0
+        # how many nodes alphaBeta has searched (in every process)
+        self.nodeCount = 0
+        # keep the points of each player in the state being searched (see
+        # FoodEvaluator), indexed by player id
+        self.evaluators = None
+        # the processes to search in (see searchParallel)
+        self.numWorkers = PARALLEL_WORKERS
+        self.searchPool = None
         
     ##
     #getPlacement
@@ -297,6 +1013,9 @@ class AIPlayer(Player):
         numToPlace = 0
         #implemented by students to return their next move
         if currentState.phase == SETUP_PHASE_1:    #stuff on my side
+            # a new game:  stop the workers of one that was reset or abandoned
+            # before registerWin could
+            closeSearchPool(self)
             numToPlace = 11
             moves = []
             for i in range(0, numToPlace):
@@ -335,7 +1054,9 @@ class AIPlayer(Player):
     
     ##
     #getMove
-    #Description: Gets the next move from the Player. Searches with a depth limit.
+    #Description: Gets the next move from the Player. Searches with alpha-beta,
+    #   deeper and deeper until timeFraction of AI_MOVE_TIMEOUT has passed
+    #   (in numWorkers processes if there are 2 or more, see searchParallel).
     #
     #Parameters:
     #   currentState - The state of the current game waiting for the player's move (GameState)
@@ -344,9 +1065,13 @@ class AIPlayer(Player):
     ##
     def getMove(self, currentState):
        
-        depthLim = 2 # search 2 nodes deep in recursive function
-        newMove = searchTree(self, currentState, 0, depthLim)
-        return newMove
+        # the values depend on which player this agent is, which can change
+        # between games, so only reuse them within a search
+        self.transpositionTable.clear()
+        timeLimit = self.timeFraction * AI_MOVE_TIMEOUT
+        if self.numWorkers > 1:
+            return searchParallel(self, currentState, timeLimit)
+        return searchIterative(self, currentState, timeLimit)
     
     ##
     #getAttack
@@ -361,6 +1086,24 @@ class AIPlayer(Player):
         #Attack a random enemy.
         return enemyLocations[random.randint(0, len(enemyLocations) - 1)]
 
+    ##
+    #registerWin
+    #
+    # This agent doesn't learn.  If REPORT_CACHE is set it reports how often
+    # the evaluation cache had a value (to help size EVAL_CACHE_LIMIT).  It
+    # stops its worker processes until the next game needs them.
+    #
+    def registerWin(self, hasWon):
+        cache = self.evalCache
+        if cache is not None:
+            if REPORT_CACHE:
+                lookups = max(cache.hits + cache.misses, 1)
+                print "%s: evaluation cache %d hits, %d misses (%.0f%% hit), %d evictions" % \
+                    (self.author, cache.hits, cache.misses, 100.0 * cache.hits / lookups,
+                     cache.evictions)
+            cache.resetCounters()
+        closeSearchPool(self)
+
     
 #Unittesting
 
@@ -384,14 +1127,6 @@ if(getFoodCost(antList) != 1):
     print("getFoodCost is not working")
     
 
-#testing to see if findOverallScore finds the average score
-node1 = Node(0,0,0,0.5)
-node2 = Node(0,0,0,0.7)
-nodeList = (node1, node2)
-if(findOverallScore(nodeList) != 0.6):
-    print("findOverallScore does not work")    
-
-
 # unit test for getStateValue
 
 #Player IDs
@@ -419,9 +1154,81 @@ testInv4 = Inventory(player0, [ant1, ant2], [con1,con3,con5], 1)
 #game states
 state1 = GameState(0, (testInv, testInv2, testInv3), 3, player0)
 state1Val = getStateValue(player0, state1)
-# player 1 has 10 food and no workers
-# (10 * 24) / 264 = 0.9090
+# player 1 has 10 food and no workers (and player 2 has nothing)
+# 0.5 + (10 * 24) / (2 * 264) = 0.9545
 print "State value of 10 food no workers: " + str(getStateValue(player0, state1))
-print "Expected state value: " + str( (10 * 24) / float(264) )
+print "Expected state value: " + str( 0.5 + (10 * 24) / float(2 * 264) )
+
+
+# unit test for searchAlphaBeta
+
+#creation of ants
+ant1 = Ant((0,1), WORKER, PLAYER_ONE)
+ant2 = Ant((0,0), QUEEN, PLAYER_ONE)
+ant3 = Ant((0,8), WORKER, PLAYER_TWO)
+ant4 = Ant((0,9), QUEEN, PLAYER_TWO)
+#creation of constructs
+con1 = Building((0,0), ANTHILL, PLAYER_ONE)
+con2 = Building((0,9), ANTHILL, PLAYER_TWO)
+con3 = Building((1,0), TUNNEL, PLAYER_ONE)
+con4 = Building((1,9), TUNNEL, PLAYER_TWO)
+con5 = Construction((2,3), FOOD)
+con6 = Construction((2,6), FOOD)
+#a game state with a board-less copy of everything
+testInv = Inventory(PLAYER_ONE, [ant2, ant1], [con1, con3], 1)
+testInv2 = Inventory(PLAYER_TWO, [ant4, ant3], [con2, con4], 1)
+testInv3 = Inventory(NEUTRAL, [], [con5, con6], 0)
+state2 = GameState(None, [testInv, testInv2, testInv3], PLAY_PHASE, PLAYER_ONE)
+# with no deadline a search to a depth of 3 visits more states than one to a
+# depth of 2 (nothing caps the depth)
+nodeCounts = []
+for depth in (2, 3):
+    player0.transpositionTable.clear()
+    player0.nodeCount = 0
+    searchAlphaBeta(player0, state2, depth)
+    nodeCounts.append(player0.nodeCount)
+if nodeCounts[1] <= nodeCounts[0]:
+    print "searchAlphaBeta does not search past a depth of 2"
+
+
+
+# unit test for iterNextStates
+
+# a drone of player 1 next to player 2's worker, so some moves attack
+ant5 = Ant((1,7), DRONE, PLAYER_ONE)
+testInv = Inventory(PLAYER_ONE, [ant2, ant1, ant5], [con1, con3], 1)
+state3 = GameState(None, [testInv, testInv2, testInv3], PLAY_PHASE, PLAYER_ONE)
+moves = listAllLegalMoves(state3)
+parent = state3.fastclone()
+for move, child, record in iterNextStates(parent, moves):
+    expected = getNextState(state3, move)
+    for inv, expectedInv in zip(child.inventories, expected.inventories):
+        ants = [(ant.coords, ant.type, ant.health, ant.carrying, ant.hasMoved)
+                for ant in inv.ants]
+        expectedAnts = [(ant.coords, ant.type, ant.health, ant.carrying, ant.hasMoved)
+                        for ant in expectedInv.ants]
+        if ants != expectedAnts or inv.foodCount != expectedInv.foodCount:
+            print "iterNextStates does not make the same child as getNextState"
+    if child.whoseTurn != expected.whoseTurn or \
+            child.getHashKey() != expected.getHashKey():
+        print "iterNextStates does not make the same child as getNextState"
+# the moves are all taken back
+if parent.getHashKey() != state3.getHashKey() or \
+        [ant.coords for ant in parent.inventories[PLAYER_TWO].ants] != [(0,9), (0,8)]:
+    print "iterNextStates does not restore the state"
+
 
+# unit test for evaluateLeaves (which needs NumPy)
 
+if HAVE_NUMPY:
+    # a worker of player 1 carrying food on its tunnel, so ending the turn
+    # delivers it (and the drone can still kill player 2's worker)
+    ant6 = Ant((1,0), WORKER, PLAYER_ONE)
+    ant6.carrying = True
+    testInv = Inventory(PLAYER_ONE, [ant2, ant1, ant5, ant6], [con1, con3], 1)
+    state4 = GameState(None, [testInv, testInv2, testInv3], PLAY_PHASE, PLAYER_ONE)
+    moves = listAllLegalMoves(state4)
+    values = evaluateLeaves(player0, state4.fastclone(), moves)
+    expected = [getStateValue(player0, getNextState(state4, move)) for move in moves]
+    if values != expected:
+        print "evaluateLeaves does not give the values getStateValue does"
@@ -1,8 +1,11 @@
 import random
+import heapq
 from Constants import *
 from Ant import *
 from Construction import *
 from Move import *
+from Bitboard import *
+from Rules import *
 
 #
 # AIPlayerUtils.py
@@ -114,12 +117,10 @@ def getConstrList(currentState,
 #
 # Return:  the construct at the coordinate or None if there is none
 def getConstrAt(state, coords):
-    #get a list of all constructs
-    allConstrs = getConstrList(state)
-
-    #search for one at the given coord
-    for constr in allConstrs:
-        if (constr.coords == coords):
+    #each inventory keeps its constructs indexed by their coords
+    for inv in state.inventories:
+        constr = inv.getConstrAt(coords)
+        if constr is not None:
             return constr
 
     return None  #not found
@@ -135,12 +136,10 @@ def getConstrAt(state, coords):
 #
 # Return:  the ant at the coordinate or None if there is none
 def getAntAt(state, coords):
-    #get a list of all constructs
-    allAnts = getAntList(state)
-
-    #search for one at the given coord
-    for ant in allAnts:
-        if (ant.coords == coords):
+    #each inventory keeps its ants indexed by their coords
+    for inv in state.inventories:
+        ant = inv.getAntAt(coords)
+        if ant is not None:
             return ant
 
     return None  #not found
@@ -155,28 +154,16 @@ def getAntAt(state, coords):
 # Return: a list of all legal coords that are adjacent to the given space
 #
 def listAdjacent(coord):
-    #catch invalid inputs
+    try:
+        return list(NEIGHBORS[coord])
+    except (KeyError, TypeError):
+        pass
+
+    #catch invalid inputs (a legal coord may still be a list)
     if (not legalCoord(coord)):
         return [];
 
-    #this set of coord deltas represent movement in each cardinal direction
-    deltas = [ (-1, 0), (1, 0), (0, -1), (0, 1) ]
-    x = coord[0]
-    y = coord[1]
-    result = []
-
-    #calculate the cost after making each move
-    for delta in deltas:
-        newX = delta[0] + coord[0]
-        newY = delta[1] + coord[1]
-
-        #skip illegal moves
-        if (not legalCoord((newX, newY))):
-            continue
-
-        result.append((newX, newY))
-
-    return result
+    return list(NEIGHBORS[(coord[0], coord[1])])
 
 
 ##
@@ -188,46 +175,134 @@ def listAdjacent(coord):
 #    state        - a GameState object 
 #    coords       - where the ant is
 #    movement     - movement points the ant has
+#    boards       - the state's Bitboards (optional; built if not given)
 #
 # Return:  a list of coords (tuples)   
-def listReachableAdjacent(state, coords, movement):
-    #build a list of all adjacent cells
-    oneStep = listAdjacent(coords)
+def listReachableAdjacent(state, coords, movement, boards = None):
+    if boards == None:
+        boards = Bitboards(state)
+
+    try:
+        adjacent = ADJACENT_BITS[coords]
+    except (KeyError, TypeError):
+        adjacent = adjacentCells(coords)
 
-    #winnow the list based upon cell contents and cost to reach
+    #winnow the adjacent cells based upon cell contents and cost to reach
     candMoves = []
-    for cell in oneStep:
-        ant = getAntAt(state, cell)
-        constr = getConstrAt(state, cell)
-        moveCost = 1  #default cost
-        if (constr != None):
-            moveCost = CONSTR_STATS[constr.type][MOVE_COST]
-        if (ant == None) and (moveCost <= movement):
+    for cell, bit in adjacent:
+        if (not boards.ants & bit) and (boards.moveCost(bit) <= movement):
             candMoves.append(cell)
 
     return candMoves
 
 ##
-# listAllMovementPaths              <!-- RECURSIVE -->
+# listAllMovementPaths
 #
 # calculates all the legal paths for a single ant to move from a given position.
 # The ant doesn't actually have to be there for this method to return a valid
 # answer.  This method does not take queen ant movement restrictions
 # into account.
 #
+# The paths are picked out of MOVEMENT_PATHS (see below) so nothing needs to
+# be searched unless coords isn't a tuple on the board or movement is more
+# than MAX_MOVEMENT.  The result is the same as searchMovementPaths's.
+#
 # Parameters:
 #    currentState - current game state
 #    coords       - where the ant is
 #    movement     - movement points ant has remaining
+#    boards       - the state's Bitboards (optional; built if not given)
+#    uniqueDest   - if True only the cheapest path to each destination is
+#                   returned (see keepCheapestPaths)
 #
 # Return: a list of lists of coords (tuples). Each sub-list of tuples is an
 # acceptable set of coords for a Move object
-def listAllMovementPaths(currentState, coords, movement):
+def listAllMovementPaths(currentState, coords, movement, boards = None, uniqueDest = False):
+    #base case: ant can't move any further
+    if (movement <= 0): return []
+
+    if boards == None:
+        boards = Bitboards(currentState)
+
+    try:
+        paths = MOVEMENT_PATHS[coords]
+    except (KeyError, TypeError):
+        paths = None
+    if paths == None or movement > MAX_MOVEMENT:
+        validMoves = searchMovementPaths(currentState, coords, movement, boards)
+        if uniqueDest:
+            validMoves = keepCheapestPaths(validMoves, boards)
+        return validMoves
+
+    #keep the paths that are affordable and don't run into an ant
+    costs = getMovementPathCosts(boards.grass, coords)
+    ants = boards.ants
+    validMoves = []
+    for i in xrange(0, len(paths)):
+        if costs[i] <= movement and not paths[i][1] & ants:
+            validMoves.append(list(paths[i][0]))
+
+    #Append the zero-step move (used to activate attack on adjacent foe)
+    validMoves.append([coords])
+
+    if uniqueDest:
+        validMoves = keepCheapestPaths(validMoves, boards)
+    return validMoves
+
+##
+# keepCheapestPaths
+#
+# Moving an ant has the same effect whichever path it takes to get where it
+# ends up, so all but one path to each destination can be dropped.
+#
+# Parameters:
+#    paths        - a list of paths starting at the same cell (as returned by
+#                   listAllMovementPaths)
+#    boards       - the state's Bitboards (for the cost of each step)
+#
+# Return: a list with the cheapest path (the first one listed if several
+# cost the same) to each destination, in the order the destinations first
+# appear in paths.  The zero-step move, if there is one, stays last and
+# replaces any path that returns to the starting cell.
+def keepCheapestPaths(paths, boards):
+    cheapest = {}
+    destinations = []
+    zeroStep = None
+    for path in paths:
+        if len(path) == 1:
+            zeroStep = path
+            continue
+        cost = 0
+        for cell in path[1:]:
+            cost += boards.moveCost(CELL_BITS[cell])
+        dest = path[-1]
+        if not dest in cheapest:
+            destinations.append(dest)
+            cheapest[dest] = (cost, path)
+        elif cost < cheapest[dest][0]:
+            cheapest[dest] = (cost, path)
+
+    if zeroStep != None:
+        start = tuple(zeroStep[0])
+        if start in cheapest:
+            destinations.remove(start)
+    result = [cheapest[dest][1] for dest in destinations]
+    if zeroStep != None:
+        result.append(zeroStep)
+    return result
+
+##
+# searchMovementPaths              <!-- RECURSIVE -->
+#
+# the search that listAllMovementPaths stands in for (see above).  It takes
+# the same parameters except that boards is required.
+#
+def searchMovementPaths(currentState, coords, movement, boards):
     #base case: ant can't move any further
     if (movement <= 0): return []
 
     #construct a list of all valid one-step moves
-    adjCells = listReachableAdjacent(currentState, coords, movement)
+    adjCells = listReachableAdjacent(currentState, coords, movement, boards)
     oneStepMoves = []
     for cell in adjCells:
         oneStepMoves.append([coords, cell])
@@ -239,13 +314,10 @@ def listAllMovementPaths(currentState, coords, movement):
     for move in oneStepMoves:
         #figure out what it would cost to get to the current dest
         moveCoords = move[-1]
-        constrAtDest = getConstrAt(currentState, moveCoords)
-        cost = 1   #default
-        if constrAtDest != None:
-            cost = CONSTR_STATS[constrAtDest.type][MOVE_COST]
+        cost = boards.moveCost(CELL_BITS[moveCoords])
 
         #get a list of all moves that will extend this one
-        extensions = listAllMovementPaths(currentState, moveCoords, movement - cost)
+        extensions = searchMovementPaths(currentState, moveCoords, movement - cost, boards)
 
         #create new moves by adding each extension to the base move
         for ext in extensions:
@@ -260,11 +332,113 @@ def listAllMovementPaths(currentState, coords, movement):
     return validMoves
 
 
+##
+# buildMovementPaths              <!-- RECURSIVE -->
+#
+# helper for the MOVEMENT_PATHS table:  lists what searchMovementPaths would
+# return for an empty board without grass (every step costs 1).  A path that
+# searchMovementPaths lists again after its extensions (it does that when the
+# ant would have movement left at its end) is flagged as a repeat.
+#
+# Return: a list of (path, isRepeat) pairs
+def buildMovementPaths(coords, movement):
+    if (movement <= 0): return []
+
+    oneStepMoves = [[coords, cell] for cell in NEIGHBORS[coords]]
+    result = [(move, False) for move in oneStepMoves]
+    for move in oneStepMoves:
+        for ext, isRepeat in buildMovementPaths(move[-1], movement - 1):
+            result.append((move + ext[1:], isRepeat))
+    result.append(([coords], True))
+
+    return result
+
+##
+# tabulateMovementPaths
+#
+# Return: the MOVEMENT_PATHS entry of a cell (see below)
+def tabulateMovementPaths(coords):
+    entries = []
+    #the last path is the zero-step move, which is always added
+    for path, isRepeat in buildMovementPaths(coords, MAX_MOVEMENT)[:-1]:
+        steps = tuple(CELL_BITS[cell] for cell in path[1:])
+        entries.append((tuple(path), pathBits(path[1:]), steps + (int(isRepeat),)))
+    return entries
+
+##
+# tabulateAttackBits
+#
+# Description: Finds the cells an ant with a given attack range can attack from
+# each cell (the same test as Game.isValidAttack).  This is a helper for
+# building ATTACK_BITS.
+#
+# Return: a dict of the set of cells in range of each cell
+def tabulateAttackBits(attackRange):
+    result = {}
+    for coords in CELL_BITS:
+        bits = 0
+        for target, bit in CELL_BITS.items():
+            dist = (coords[0] - target[0]) ** 2 + (coords[1] - target[1]) ** 2
+            if target != coords and dist <= attackRange ** 2:
+                bits |= bit
+        result[coords] = bits
+    return result
+
+##
+# Tables of the 10x10 board, built when this module is loaded
+#
+#   NEIGHBORS - the coords adjacent to each cell (in listAdjacent's order)
+#   ADJACENT_BITS - the same as (coords, bit) pairs (see Bitboard.py)
+#   MAX_MOVEMENT - the most movement points any ant has
+#   ATTACK_BITS - for each attack range, the cells an ant at each cell can
+#       attack
+#   MOVEMENT_PATHS - for each cell, every path that searchMovementPaths can
+#       return for an ant there with MAX_MOVEMENT points, in the order it
+#       returns them, as (path, bits of the cells entered, steps) where steps
+#       is a tuple of the bits of the cells entered followed by 1 if the path
+#       is a repeat (0 if not).  Since grass only makes steps dearer, the paths
+#       for a particular board are the ones that are affordable and don't
+#       enter a cell with an ant.
+#
+ADJACENT_BITS = dict((coords, tuple(adjacentCells(coords))) for coords in CELL_BITS)
+NEIGHBORS = dict((coords, tuple(cell for cell, bit in ADJACENT_BITS[coords])) for coords in CELL_BITS)
+MAX_MOVEMENT = max(stats[MOVEMENT] for stats in UNIT_STATS)
+MOVEMENT_PATHS = dict((coords, tabulateMovementPaths(coords)) for coords in CELL_BITS)
+ATTACK_BITS = dict((stats[RANGE], tabulateAttackBits(stats[RANGE])) for stats in UNIT_STATS)
+
+#the cost of every path in MOVEMENT_PATHS (plus 1 for repeats) for each
+#grass layout that has been seen recently, keyed by the grass Bitboard
+MOVEMENT_PATH_COSTS = {}
+MAX_GRASS_LAYOUTS = 32
+
+##
+# getMovementPathCosts
+#
+# Return: a list of the cost (plus 1 for repeats) of each path from a cell in
+# MOVEMENT_PATHS for a given grass layout
+def getMovementPathCosts(grass, coords):
+    layoutCosts = MOVEMENT_PATH_COSTS.get(grass)
+    if layoutCosts == None:
+        if len(MOVEMENT_PATH_COSTS) >= MAX_GRASS_LAYOUTS:
+            MOVEMENT_PATH_COSTS.clear()
+        layoutCosts = MOVEMENT_PATH_COSTS[grass] = {}
+    costs = layoutCosts.get(coords)
+    if costs == None:
+        costs = []
+        for path, bits, steps in MOVEMENT_PATHS[coords]:
+            cost = steps[-1]
+            for bit in steps[:-1]:
+                cost += GRASS_COST if grass & bit else 1
+            costs.append(cost)
+        layoutCosts[coords] = costs
+    return costs
+
+
 ##
 # stepsToReach
 #
 # calculates the shortest distance between two cells taking
-# movement costs into account.
+# movement costs into account.  Ants are not taken into account.
 #
 #Parameters:
 #   currentState   - The state of the game (GameState)
@@ -277,41 +451,124 @@ def stepsToReach(currentState, src, dst):
     if (not legalCoord(src)): return -1
     if (not legalCoord(dst)): return -1
 
-    #a dictionary of already visted cells and the corresponding cost to reach
-    visited = { src : 0 }
-    #a list of to be processed cells
-    queue = [ src ]
-
-    #this loops processes cells in the queue until it is empty
-    while(len(queue) > 0):
-        cell = queue.pop(0)
-
-        #if this cell is our destination we are done
-        if (cell == dst):
-            return visited[cell]
-
-        #calc distance to all cells adj to this one assuming we reach them
-        #from this one
-        nextSteps = listAdjacent(cell)
-        for newCell in nextSteps:
-            constrAtDest = getConstrAt(currentState, newCell)
-            cost = 1  #default
-            if constrAtDest != None:
-                cost = CONSTR_STATS[constrAtDest.type][MOVE_COST]
-            dist = visited[cell] + cost
-
-            #if the new distance is best so far, update the visited dict
-            if (visited.has_key(newCell)):
-                if (dist < visited[newCell]):
-                    visited[newCell] = dist
-            #if we've never seen this cell before also update dict and
-            #enqueue this new cell to be processed at a future loop iteration
-            else:
-                visited[newCell] = dist
-                queue.append(newCell)
+    field = getDistanceField(currentState, dst)
+    return field[src[0] * BOARD_LENGTH + src[1]]
+
+##
+# getDistanceField
+#
+# Description: Finds the number of steps it takes to reach a cell from every
+# cell on the board (see stepsToReach).  Only grass makes a step cost more
+# than one so the result is cached for each grass layout and target:  asking
+# again on the same board is a dictionary lookup.
+#
+#Parameters:
+#   currentState   - The state of the game (GameState)
+#   dst            - destination position (an x,y coord on the board)
+#
+# Return: a tuple of the steps from each cell, indexed by x * BOARD_LENGTH + y
+# (the cell's bit number in Bitboard.py).  It is shared, so don't change it.
+def getDistanceField(currentState, dst):
+    return lookupDistanceField(grassBits(currentState), tuple(dst))
+
+##
+# lookupDistanceField
+#
+# Description: getDistanceField for a grass layout that is already known.  This
+# is a helper method for getDistanceField and getDistanceTable.
+#
+#Parameters:
+#   grass - the Bitboard of the grass
+#   dst   - destination position (an x,y tuple)
+#
+# Return: the tuple described in getDistanceField
+def lookupDistanceField(grass, dst):
+    key = (grass, dst)
+    field = DISTANCE_FIELDS.get(key)
+    if field == None:
+        if len(DISTANCE_FIELDS) >= MAX_DISTANCE_FIELDS:
+            DISTANCE_FIELDS.clear()
+        field = DISTANCE_FIELDS[key] = searchDistanceField(grass, dst)
+    return field
+
+##
+# getDistanceTable
+#
+# Description: Finds the distance field (see getDistanceField) of every cell on
+# the board at once so that callers that need many distances can read them
+# with tableSteps.  Grass can't move once setup is over, so in practice the
+# table is built once per game and later calls are a dictionary lookup
+# (building a tunnel doesn't change what a step costs, so it doesn't start
+# a new table).
+#
+#Parameters:
+#   currentState   - The state of the game (GameState)
+#
+# Return: a tuple of the distance field of each cell, indexed by
+# x * BOARD_LENGTH + y.  It is shared, so don't change it.
+def getDistanceTable(currentState):
+    grass = grassBits(currentState)
+    table = DISTANCE_TABLES.get(grass)
+    if table == None:
+        if len(DISTANCE_TABLES) >= MAX_DISTANCE_TABLES:
+            DISTANCE_TABLES.clear()
+        table = DISTANCE_TABLES[grass] = tuple(lookupDistanceField(grass, (x, y))
+                                               for x in xrange(0, BOARD_LENGTH)
+                                               for y in xrange(0, BOARD_LENGTH))
+    return table
+
+##
+# tableSteps
+#
+# Description: stepsToReach using a table from getDistanceTable
+#
+#Parameters:
+#   table - the distance table of the state
+#   src   - starting position (an x,y coord on the board)
+#   dst   - destination position (an x,y coord on the board)
+#
+# Return: the costs in steps (an integer)
+def tableSteps(table, src, dst):
+    return table[dst[0] * BOARD_LENGTH + dst[1]][src[0] * BOARD_LENGTH + src[1]]
 
-    #we should never reach this point
-    return -1
+##
+# searchDistanceField
+#
+# Description: Runs Dijkstra's algorithm backward from the destination.  Moving
+# from a cell to a neighbour costs what it costs to enter the neighbour, so
+# each cell is a step (costing its own movement cost) closer to the
+# destination than the cheapest of its neighbours.  This is a helper method
+# for getDistanceField.
+#
+#Parameters:
+#   grass - the Bitboard of the grass
+#   dst   - destination position (an x,y tuple)
+#
+# Return: the tuple described in getDistanceField
+def searchDistanceField(grass, dst):
+    dist = [-1] * NUM_CELLS
+    heap = [(0, dst)]
+    while heap:
+        steps, cell = heapq.heappop(heap)
+        index = cell[0] * BOARD_LENGTH + cell[1]
+        if dist[index] >= 0:
+            continue    #already reached more cheaply
+        dist[index] = steps
+        steps += GRASS_COST if grass & CELL_BITS[cell] else 1
+        for newCell in NEIGHBORS[cell]:
+            if dist[newCell[0] * BOARD_LENGTH + newCell[1]] < 0:
+                heapq.heappush(heap, (steps, newCell))
+    return tuple(dist)
+
+#the distance fields that have been found (see getDistanceField), keyed by
+#the grass Bitboard and the destination
+DISTANCE_FIELDS = {}
+MAX_DISTANCE_FIELDS = 4 * NUM_CELLS
+
+#the distance tables that have been built (see getDistanceTable), keyed by
+#the grass Bitboard
+DISTANCE_TABLES = {}
+MAX_DISTANCE_TABLES = 4
 
 ##
 # approxDist
@@ -333,6 +590,11 @@ def approxDist(sourceCoords, targetCoords):
 # creates a legal path toward a destination.  This method does not verify that
 # the path is okay for a queen.
 #
+# The path ends as close to the destination as the ant can get this turn,
+# measured with the destination's distance field (see getDistanceField), so
+# grass is walked around whenever that is quicker.  Of the paths that get
+# that close the cheapest one is used.
+#
 # Parameters:
 #   currentState - currentState of the game
 #   sourceCoords - starting position (an x,y coord)
@@ -342,34 +604,69 @@ def approxDist(sourceCoords, targetCoords):
 # Return the required path
 #
 def createPathToward(currentState, sourceCoords, targetCoords, movement):
-    distToTarget = approxDist(sourceCoords, targetCoords)
     path = [sourceCoords]
-    curr = sourceCoords
-
-    #keep adding steps to the path until movement runs out 
-    while (movement > 0):
-        found = False  #was a new step found to add to the path
-        for coord in listReachableAdjacent(currentState, sourceCoords, movement):
-            #is this a step headed in the right direction?
-            if (approxDist(coord, targetCoords) < distToTarget):
-
-                #how much movement does it cost to get there?
-                constr = getConstrAt(currentState, coord)
-                moveCost = 1  #default cost
-                if (constr != None):
-                    moveCost = CONSTR_STATS[constr.type][MOVE_COST]
-                #if I have enough movement left then add it to the path
-                if (moveCost <= movement):
-                    #add the step to the path
-                    found = True
-                    path.append(coord)
-
-                    #restart the search from the new coordinate
-                    movement = movement - moveCost
-                    sourceCoords = coord
-                    distToTarget = approxDist(sourceCoords, targetCoords)
-                    break
-        if (not found): break #no usable steps found
+    if (not legalCoord(sourceCoords)) or (not legalCoord(targetCoords)):
+        return path
+
+    grass = grassBits(currentState)
+    ants = antBits(currentState)
+    field = lookupDistanceField(grass, tuple(targetCoords))
+    curr = tuple(sourceCoords)
+    if (movement > MAX_MOVEMENT):
+        return walkDistanceField(path, field, grass, ants, movement)
+
+    #try every path the ant could take (see MOVEMENT_PATHS)
+    bestDist = field[curr[0] * BOARD_LENGTH + curr[1]]
+    bestCost = 0
+    costs = getMovementPathCosts(grass, curr)
+    for (steps, bits, unused), cost in zip(MOVEMENT_PATHS[curr], costs):
+        if (cost > movement or bits & ants): continue
+        end = steps[-1]
+        dist = field[end[0] * BOARD_LENGTH + end[1]]
+        if (dist < bestDist or (dist == bestDist and cost < bestCost)):
+            path = [sourceCoords] + list(steps[1:])
+            bestDist = dist
+            bestCost = cost
+
+    return path
+
+##
+# walkDistanceField
+#
+# Description: Extends a path one step at a time to the unoccupied neighbour
+# that is closest to the destination (as long as it is closer than the current
+# cell).  This is a helper method for createPathToward when an ant has more
+# movement than MOVEMENT_PATHS covers.
+#
+# Parameters:
+#   path - the path so far (just the starting position)
+#   field - the destination's distance field
+#   grass, ants - the Bitboards of the grass and the ants
+#   movement - movement points to spend
+#
+# Return the path
+def walkDistanceField(path, field, grass, ants, movement):
+    curr = tuple(path[-1])
+    distToTarget = field[curr[0] * BOARD_LENGTH + curr[1]]
+
+    #keep adding steps to the path until movement runs out
+    while (movement > 0 and distToTarget > 0):
+        best = None    #the best step found so far
+        for coord, bit in ADJACENT_BITS[curr]:
+            dist = field[coord[0] * BOARD_LENGTH + coord[1]]
+            if (dist >= distToTarget or ants & bit): continue
+            moveCost = GRASS_COST if grass & bit else 1
+            if (moveCost <= movement) and (best == None or dist < bestDist):
+                best = coord
+                bestDist = dist
+                bestCost = moveCost
+        if (best == None): break #no usable steps found
+
+        #add the step to the path and continue from there
+        path.append(best)
+        movement = movement - bestCost
+        curr = best
+        distToTarget = bestDist
 
     return path
         
@@ -381,48 +678,46 @@ def createPathToward(currentState, sourceCoords, targetCoords, movement):
 #
 # Parameters
 #   currentState - currentState of the game
+#   boards       - the state's Bitboards (optional; built if not given)
 #
 # Returns: a list of Move objects
-def listAllBuildMoves(currentState):
-    result = []
+def listAllBuildMoves(currentState, boards = None):
+    return list(iterBuildMoves(currentState, boards))
+
+##
+# iterBuildMoves
+#
+# Description: A generator version of listAllBuildMoves.  The Move objects are
+# created as they are asked for.
+#
+def iterBuildMoves(currentState, boards = None):
+    if boards == None:
+        boards = Bitboards(currentState)
 
     #if the anthill is unoccupied list a BUILD move for each ant
     #that there is enough food to build
     myInv = getCurrPlayerInventory(currentState)
     hill = myInv.getAnthill()
-    if (getAntAt(currentState, hill.coords)  == None):
+    if (not boards.ants & CELL_BITS[hill.coords]):
         for type in range(WORKER, R_SOLDIER + 1):
             cost = UNIT_STATS[type][COST]
             if (cost <= myInv.foodCount):
-                result.append(Move(BUILD, [hill.coords], type))
+                yield Move(BUILD, [hill.coords], type)
 
     #if we don't have 3 food to build a tunnel then we're done
     if (myInv.foodCount < 3):
-        return result
+        return
                 
     #for each worker ant that is a legal position, you could build
     #a tunnel
     for ant in myInv.ants:
         if (ant.type != WORKER): continue   #only workers can build tunnels
         if (ant.hasMoved): continue         #this worker has already moved
-        if (getConstrAt(currentState, ant.coords) == None):
-            #see if there is adj food
-            inTheClear = True   #assume ok to build until proven otherwise
-            for coord in listAdjacent(ant.coords):
-                if (not legalCoord((coord[0],coord[1]))):
-                    continue
-
-                #is there food here?
-                constrHere = getConstrAt(currentState, coord)
-                if (constrHere != None) and (constrHere.type == FOOD):
-                    inTheClear = False
-                    break
-
-            #if no food was found then building a tunnel is valid
-            if inTheClear:
-                result.append(Move(BUILD, [ant.coords], TUNNEL))
-
-    return result
+        bit = CELL_BITS[ant.coords]
+        if (not boards.constrs & bit):
+            #if there is no adjacent food then building a tunnel is valid
+            if (not adjacentBits(bit) & boards.food):
+                yield Move(BUILD, [ant.coords], TUNNEL)
 
 ##
 # isPathOkForQueen
@@ -437,11 +732,7 @@ def listAllBuildMoves(currentState):
 # Return: True if the is okay
 #
 def isPathOkForQueen(path):
-    for coord in path:
-        if (coord[1] == BOARD_LENGTH / 2 - 1) \
-        or (coord[1] == BOARD_LENGTH / 2):
-            return False
-    return True
+    return not (pathBits(path) & QUEEN_FORBIDDEN)
     
 ##
 # listAllMovementMoves
@@ -451,10 +742,15 @@ def isPathOkForQueen(path):
 #
 # Parameters:
 #   currentState - the current state
+#   boards       - the state's Bitboards (optional; built if not given)
+#   uniqueDest   - if True each ant gets only one move to each cell it can
+#                  reach (see keepCheapestPaths)
 #
 # Returns:  a list of Move objects
-def listAllMovementMoves(currentState):
+def listAllMovementMoves(currentState, boards = None, uniqueDest = False):
     result = []
+    if boards == None:
+        boards = Bitboards(currentState)
 
     #first get all MOVE_ANT moves for each ant in the inventory
     myInv = getCurrPlayerInventory(currentState)
@@ -462,25 +758,73 @@ def listAllMovementMoves(currentState):
         #skip ants that have already moved
         if (ant.hasMoved): continue
 
-        #create a Move object for each valid movement path
-        allPaths = listAllMovementPaths(currentState,
-                                        ant.coords,
-                                        UNIT_STATS[ant.type][MOVEMENT])
-
-        #remove moves that take the queen out of her territory
-        if (ant.type == QUEEN):
-            tmpList = []
-            for path in allPaths:
-                if (isPathOkForQueen(path)):
-                    tmpList.append(path)
-            allPaths = tmpList
-
         #construct the list of moves using the paths
-        for path in allPaths:
+        for path in listAntPaths(currentState, ant, boards, uniqueDest):
             result.append(Move(MOVE_ANT, path, None))
 
     return result
 
+##
+# listAntPaths
+#
+# Description: Lists the paths a single ant may legally take.  This is a
+# helper method for listAllMovementMoves and iterLegalMoves.
+#
+# Parameters:
+#   currentState - the current state
+#   ant - the ant to move (the caller checks that it hasn't moved)
+#   boards - the Bitboards of currentState
+#   uniqueDest - see listAllLegalMoves
+#
+# Return: a list of paths
+def listAntPaths(currentState, ant, boards, uniqueDest = False):
+    allPaths = listAllMovementPaths(currentState,
+                                    ant.coords,
+                                    UNIT_STATS[ant.type][MOVEMENT],
+                                    boards)
+
+    #remove moves that take the queen out of her territory
+    if (ant.type == QUEEN):
+        tmpList = []
+        for path in allPaths:
+            if (isPathOkForQueen(path)):
+                tmpList.append(path)
+        allPaths = tmpList
+
+    #only after that (a cheapest path may not be okay for the queen)
+    #drop the extra paths to each destination
+    if uniqueDest:
+        allPaths = keepCheapestPaths(allPaths, boards)
+
+    return allPaths
+
+##
+# getStageCells
+#
+# Description: Finds the cells that make a MOVE_ANT by a given ant one of the
+# ATTACK_MOVES (in range of an enemy ant or on an enemy building) or one of the
+# FOOD_MOVES (food for a worker that isn't carrying, its own anthill or
+# tunnels for one that is).  Workers never attack, so none of their moves are
+# ATTACK_MOVES.  Every other MOVE_ANT is one of the QUIET_MOVES.  This is a
+# helper method for iterLegalMoves.
+#
+# Parameters:
+#   currentState - the current state
+#   ant - the ant that is moving
+#   boards - the Bitboards of currentState
+#
+# Return: (attack cells, food cells)
+def getStageCells(currentState, ant, boards):
+    if ant.type == WORKER:
+        if ant.carrying:
+            return (0, boards.playerBuildings[ant.player])
+        return (0, boards.food)
+    enemy = 1 - ant.player
+    inRange = ATTACK_BITS[UNIT_STATS[ant.type][RANGE]]
+    attackCells = boards.playerBuildings[enemy]
+    for enemyAnt in currentState.inventories[enemy].ants:
+        attackCells |= inRange[enemyAnt.coords]
+    return (attackCells, 0)
 
 ##
 # listAllLegalMoves
@@ -490,15 +834,86 @@ def listAllMovementMoves(currentState):
 #
 # Parameters:
 #   currentState - the current state
+#   uniqueDest   - if True each ant gets only one move to each cell it can
+#                  reach, which doesn't lose any distinct outcome (see
+#                  keepCheapestPaths)
 #
 # Returns:  a list of Move objects
-def listAllLegalMoves(currentState):
+def listAllLegalMoves(currentState, uniqueDest = False):
     result = []
-    result.extend(listAllMovementMoves(currentState))
-    result.extend(listAllBuildMoves(currentState))
+    boards = Bitboards(currentState)
+    result.extend(listAllMovementMoves(currentState, boards, uniqueDest))
+    result.extend(listAllBuildMoves(currentState, boards))
     result.append(Move(END, None, None))
     return result
 
+##
+# The stages iterLegalMoves generates moves in
+#
+#   ATTACK_MOVES - MOVE_ANTs of ants other than workers that end in range of
+#       an enemy ant or on an enemy building
+#   FOOD_MOVES - MOVE_ANTs that take a worker to food or a carrying worker to
+#       its anthill or a tunnel
+#   BUILD_MOVES - BUILDs
+#   QUIET_MOVES - every other MOVE_ANT
+#   END_MOVE - the END move
+#
+ATTACK_MOVES = 0
+FOOD_MOVES = 1
+BUILD_MOVES = 2
+QUIET_MOVES = 3
+END_MOVE = 4
+DEFAULT_MOVE_ORDER = (ATTACK_MOVES, FOOD_MOVES, BUILD_MOVES, QUIET_MOVES, END_MOVE)
+
+##
+# iterLegalMoves
+#
+# Description: A generator version of listAllLegalMoves that yields the moves
+# a stage at a time, so a search that cuts off early (or only wants some kinds
+# of moves) doesn't pay for creating the rest.  Each ant's paths are only
+# found when the first MOVE_ANT stage needs them and each Move is only created
+# when it is asked for.
+#
+# The state must be the same every time the generator is resumed, which is
+# the case if the caller undoes (see undoMove) each move it applies.
+#
+# Parameters:
+#   currentState - the current state
+#   order - the stages to generate, in order (see DEFAULT_MOVE_ORDER).
+#       Stages that are left out are not generated at all.
+#   uniqueDest - see listAllLegalMoves
+#
+# Returns:  a generator of Move objects
+def iterLegalMoves(currentState, order = DEFAULT_MOVE_ORDER, uniqueDest = False):
+    boards = Bitboards(currentState)
+    myInv = getCurrPlayerInventory(currentState)
+
+    #the (stage, path) pairs of each ant that hasn't moved, once they're known
+    stagedPaths = None
+    for stage in order:
+        if stage == BUILD_MOVES:
+            for move in iterBuildMoves(currentState, boards):
+                yield move
+        elif stage == END_MOVE:
+            yield Move(END, None, None)
+        else:
+            if stagedPaths == None:
+                stagedPaths = []
+                for ant in myInv.ants:
+                    if (ant.hasMoved): continue
+                    attackCells, foodCells = getStageCells(currentState, ant, boards)
+                    for path in listAntPaths(currentState, ant, boards, uniqueDest):
+                        destBit = CELL_BITS[tuple(path[-1])]
+                        if destBit & attackCells:
+                            stagedPaths.append((ATTACK_MOVES, path))
+                        elif destBit & foodCells:
+                            stagedPaths.append((FOOD_MOVES, path))
+                        else:
+                            stagedPaths.append((QUIET_MOVES, path))
+            for pathStage, path in stagedPaths:
+                if pathStage == stage:
+                    yield Move(MOVE_ANT, path, None)
+
 
 
 ##
@@ -524,6 +939,67 @@ def getCurrPlayerQueen(currentState):
             break
     return queen
 
+##
+# applyMove
+#
+# Description: Modifies the given state in place to reflect what it would look
+# like after a given move, using the same rules as the game itself (see
+# Rules.py).  This is the same transition that getNextState makes but nothing
+# is copied.  Every change is logged so that undoMove can restore the state
+# exactly.  If the state has a board it is kept up to date as well, and so is
+# the state's Zobrist key (see Zobrist.py).
+#
+# An ant that moves next to enemies attacks the first one it can (which is
+# what an agent whose getAttack returns enemyLocations[0] would do).  Ending
+# the turn makes it the other player's turn.
+#
+# Parameters:
+#   currentState - the state to modify (GameState)
+#   move - The move that the agent would take (Move)
+#   enemyBits - the cells of the ants of the player whose turn it isn't (see
+#       getEnemyBits), to skip looking for an ant to attack when there is
+#       none in range.  Optional.
+#
+# Return: an undo record to pass to undoMove.  It also notes which ant moved
+#   and which died (see the ANT_MOVED and ANT_REMOVED entries in Rules.py).
+##
+def applyMove(currentState, move, enemyBits = None):
+    record = []
+    currentState.getHashKey()
+
+    if move.moveType == MOVE_ANT:
+        ant = applyAntMove(currentState, move, record)
+        if enemyBits is None or (ant.type != WORKER and
+                                 ATTACK_BITS[UNIT_STATS[ant.type][RANGE]][ant.coords] & enemyBits):
+            targets = listAttackTargets(currentState, ant)
+            if targets:
+                applyAttack(currentState, ant, targets[0], record)
+    elif move.moveType == BUILD:
+        applyBuild(currentState, move, record)
+    elif move.moveType == END:
+        applyEndTurn(currentState, record)
+
+    return record
+
+##
+# undoMove
+#
+# Description: Reverses a call to applyMove so that the state is exactly as
+# it was before the move (including the order of the ants and constructions
+# in each inventory).  Moves must be undone in the reverse of the order in
+# which they were applied.
+#
+# Parameters:
+#   currentState - the state that was passed to applyMove (GameState)
+#   record - the undo record that applyMove returned
+##
+def undoMove(currentState, record):
+    for entry in reversed(record):
+        if entry[0] == UNDO_SET:
+            setattr(entry[1], entry[2], entry[3])
+        elif entry[0] == UNDO_CALL:
+            entry[1](*entry[2])
+
 ##
 # getNextState
 #
@@ -532,7 +1008,8 @@ def getCurrPlayerQueen(currentState):
 # Description: Creates a copy of the given state and modifies the inventories in
 # it to reflect what they would look like after a given move.  For efficiency,
 # only the inventories are modified and the board is set to None.  The original
-# (given) state is not modified.
+# (given) state is not modified.  (The changes themselves are made by
+# applyMove.)
 #
 # Parameters:
 #   currentState - A clone of the current state (GameState)
@@ -541,89 +1018,53 @@ def getCurrPlayerQueen(currentState):
 # Return: A clone of what the state would look like if the move was made
 ##
 def getNextState(currentState, move):
-    # variables I will need
     myGameState = currentState.fastclone()
-    myInv = getCurrPlayerInventory(myGameState)
-    me = myGameState.whoseTurn
-    myAnts = myInv.ants
-
-    # If enemy ant is on my anthill or tunnel update capture health
-    myTunnels = myInv.getTunnels()
-    myAntHill = myInv.getAnthill()
-    for myTunnel in myTunnels:
-        ant = getAntAt(myGameState, myTunnel.coords)
-        if ant is not None:
-            opponentsAnts = myGameState.inventories[not me].ants
-            if ant in opponentsAnts:
-                myTunnel.captureHealth -= 1
-    if getAntAt(myGameState, myAntHill.coords) is not None:
-        ant = getAntAt(myGameState, myAntHill.coords)
-        opponentsAnts = myGameState.inventories[not me].ants
-        if ant in opponentsAnts:
-            myAntHill.captureHealth -= 1
-
-    # If an ant is built update list of ants
-    antTypes = [WORKER, DRONE, SOLDIER, R_SOLDIER]
-    if move.moveType == BUILD:
-        if move.buildType in antTypes:
-            ant = Ant(myInv.getAnthill().coords, move.buildType, me)
-            myInv.ants.append(ant)
-            # Update food count depending on ant built
-            if move.buildType == WORKER:
-                myInv.foodCount -= 1
-            elif move.buildType == DRONE or move.buildType == R_SOLDIER:
-                myInv.foodCount -= 2
-            elif move.buildType == SOLDIER:
-                myInv.foodCount -= 3
-
-    # If a building is built update list of buildings and the update food count
-    if move.moveType == BUILD:
-        if move.buildType == TUNNEL:
-            building = Construction(move.coordList[0], move.buildType)
-            myInv.constrs.append(building)
-            myInv.foodCount -= 3
-
-    # If an ant is moved update their coordinates and has moved
-    if move.moveType == MOVE_ANT:
-        newCoord = move.coordList[len(move.coordList) - 1]
-        startingCoord = move.coordList[0]
-        for ant in myAnts:
-            if ant.coords == startingCoord:
-                ant.coords = newCoord
-                ant.hasMoved = False
-                # If an ant is carrying food and ends on the anthill or tunnel drop the food
-                if ant.carrying and ant.coords == myInv.getAnthill().coords:
-                    myInv.foodCount += 1
-                    ant.carrying = False
-                for tunnels in myTunnels:
-                    if ant.carrying and (ant.coords == tunnels.coords):
-                        myInv.foodCount += 1
-                        ant.carrying = False
-                # If an ant doesn't have food and ends on the food grab food
-                if not ant.carrying:
-                    foods = getConstrList(myGameState, None, (FOOD,))
-                    for food in foods:
-                        if food.coords == ant.coords:
-                            ant.carrying = True
-                # If my ant is close to an enemy ant attack it
-                adjacentTiles = listAdjacent(ant.coords)
-                for adj in adjacentTiles:
-                    if getAntAt(myGameState, adj) is not None:  # If ant is adjacent my ant
-                        closeAnt = getAntAt(myGameState, adj)
-                        if closeAnt.player != me:  # if the ant is not me
-                            closeAnt.health = closeAnt.health - UNIT_STATS[ant.type][ATTACK]  # attack
-                            # If an enemy is attacked and looses all its health remove it from the other players
-                            # inventory
-                            if closeAnt.health <= 0:
-                                enemyAnts = myGameState.inventories[not me].ants
-                                for enemy in enemyAnts:
-                                    if closeAnt.coords == enemy.coords:
-                                        myGameState.inventories[not me].ants.remove(enemy)
-                            # If attacked an ant already don't attack any more
-                            break
+    applyMove(myGameState, move)
     return myGameState
 
-    
+##
+# getEnemyBits
+#
+# Return: the set of the cells (see Bitboard.py) of the ants of the player
+# whose turn it isn't
+##
+def getEnemyBits(currentState):
+    return pathBits([ant.coords for ant in currentState.inventories[1 - currentState.whoseTurn].ants])
+
+##
+# iterNextStates
+#
+# Description: Visits the state after each of a list of moves from the same
+# state without copying anything:  each move is applied to the given state
+# itself (see applyMove) and taken back before the next one is made, so a
+# child costs only the changes its move makes.  Work that only depends on the
+# parent is done once instead of once per child:  the parent's Zobrist key,
+# which each child's key is updated from (a state the game hands to an agent
+# doesn't have one yet and computing it costs several times what the rest of
+# applyMove does), and where the enemy ants are, which spares looking for an
+# ant to attack after a move that ends out of their range.  The state is as
+# it was once the loop ends (or the generator is closed).
+#
+# Parameters:
+#   currentState - The state the moves are made from.  It is modified while
+#       the generator runs.
+#   moves - the moves to make (Move[])
+#
+# Returns:  a generator of (move, state after the move, undo record) triples.
+#   The record notes which ant moved and which died (see applyMove) so an
+#   evaluation can be brought up to date from the parent's.
+##
+def iterNextStates(currentState, moves):
+    currentState.getHashKey()
+    enemyBits = getEnemyBits(currentState)
+    for move in moves:
+        record = applyMove(currentState, move, enemyBits)
+        try:
+            yield (move, currentState, record)
+        finally:
+            undoMove(currentState, record)
+
+
 ##
 # returns a character representation of a given ant
 # (helper for asciiPrintState)
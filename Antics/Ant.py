@@ -27,6 +27,9 @@ UNIT_STATS.append((1, 1, 2, 3, 2)) #Ranged soldier
 #   player - The id of the player that owns the Ant
 ##
 class Ant(object):
+    #search trees create a great many ants so they (and the other game
+    #objects) don't get a __dict__
+    __slots__ = ('coords', 'type', 'hasMoved', 'carrying', 'player', 'health')
     
     ##
     #__init__
@@ -45,8 +48,15 @@ class Ant(object):
         self.player = inputPlayer
         self.health = UNIT_STATS[self.type][HEALTH]
 
+    ##
+    #clone
+    #Description: Returns a copy of this Ant (without rerunning __init__)
+    ##
     def clone(self):
-        rtnAnt = Ant(self.coords, self.type, self.player)
+        rtnAnt = Ant.__new__(Ant)
+        rtnAnt.coords = self.coords
+        rtnAnt.type = self.type
+        rtnAnt.player = self.player
         rtnAnt.hasMoved = self.hasMoved
         rtnAnt.carrying = self.carrying
         rtnAnt.health = self.health
@@ -0,0 +1,354 @@
+from Constants import *
+from Rules import ANT_MOVED, ANT_REMOVED
+
+#
+# BatchFeatures.py
+#
+# Encodes a batch of states (the children of a node, say) as NumPy arrays so
+# that an evaluation can score all of them with a few array operations
+# instead of a Python loop per state.  A StateBatch holds, for n states and
+# one player:
+#   - planes:  an n by NUM_CELLS array of booleans per kind of thing (ants,
+#     food, the player's anthill and tunnels), where the cell (x, y) is
+#     column x * BOARD_LENGTH + y (the same index Bitboard and CompactState
+#     use)
+#   - rows:  one entry per worker of the player in any of the states, giving
+#     the state it is in, its cell and whether it is carrying food
+#   - the food count of both players in each state
+#
+# ChildEncoder encodes the children of one state from the parent's encoding
+# and what each move changed, which is much cheaper than encodeStates when
+# most of the moves are MOVE_ANTs.
+#
+# NumPy is optional.  HAVE_NUMPY is False when it can't be imported and then
+# none of the functions here may be called:  evaluations must check
+# HAVE_NUMPY and score the states one at a time instead.
+#
+
+try:
+    import numpy
+    HAVE_NUMPY = True
+except ImportError:
+    numpy = None
+    HAVE_NUMPY = False
+
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+
+#the NumPy array of each distance table converted by distanceMatrix, keyed
+#by the table's id (along with the table itself, to keep the id in use)
+DISTANCE_MATRICES = {}
+MAX_DISTANCE_MATRICES = 8
+
+##
+#StateBatch
+#Description: A batch of states encoded as NumPy arrays (see the notes above)
+#
+#Variables:
+#   size - the number of states (n)
+#   playerId - the player whose workers and buildings were encoded
+#   foodCounts - an n by 2 array of each player's food count
+#   ants - an n by NUM_CELLS plane of the cells with an ant (of any player)
+#   food - an n by NUM_CELLS plane of the cells with food
+#   buildings - an n by NUM_CELLS plane of the player's anthill and tunnels
+#   workerStates - the index of the state each worker is in
+#   workerCells - the cell of each worker
+#   workerCarrying - whether each worker is carrying food
+##
+class StateBatch(object):
+    __slots__ = ('size', 'playerId', 'foodCounts', 'ants', 'food', 'buildings',
+                 'workerStates', 'workerCells', 'workerCarrying')
+
+##
+# cellIndex
+#
+# Description: Returns the index of a cell in the planes of a StateBatch
+#
+# Parameters:
+#   coords - an x,y coord on the board
+##
+def cellIndex(coords):
+    return coords[0] * BOARD_LENGTH + coords[1]
+
+##
+# cellMask
+#
+# Description: Returns a plane (a NUM_CELLS array of booleans) of the cells
+# that pass a test, to mask the planes of a StateBatch with
+#
+# Parameters:
+#   test - a function of an x,y coord that returns True or False
+##
+def cellMask(test):
+    mask = numpy.zeros(NUM_CELLS, dtype=bool)
+    for x in xrange(0, BOARD_LENGTH):
+        for y in xrange(0, BOARD_LENGTH):
+            mask[cellIndex((x, y))] = bool(test((x, y)))
+    return mask
+
+##
+# encodeStates
+#
+# Description: Encodes states as a StateBatch.  Each state is only read while
+# the states are being iterated over, so they may be the children yielded by
+# AIPlayerUtils.iterNextStates (which are one state changed over and over).
+#
+# Parameters:
+#   states - an iterable of GameStates
+#   playerId - the player whose workers and buildings to encode
+#
+# Return: a StateBatch
+##
+def encodeStates(states, playerId):
+    foodCounts = []
+    antRows, antCells = [], []
+    foodRows, foodCells = [], []
+    buildingRows, buildingCells = [], []
+    workerStates, workerCells, workerCarrying = [], [], []
+
+    size = 0
+    for state in states:
+        row = size
+        size += 1
+        foodCounts.append((state.inventories[PLAYER_ONE].foodCount,
+                           state.inventories[PLAYER_TWO].foodCount))
+        for inv in state.inventories:
+            mine = inv.player == playerId
+            for ant in inv.ants:
+                cell = cellIndex(ant.coords)
+                antRows.append(row)
+                antCells.append(cell)
+                if mine and ant.type == WORKER:
+                    workerStates.append(row)
+                    workerCells.append(cell)
+                    workerCarrying.append(ant.carrying)
+            for constr in inv.constrs:
+                if constr.type == FOOD:
+                    foodRows.append(row)
+                    foodCells.append(cellIndex(constr.coords))
+                elif mine and constr.type in (ANTHILL, TUNNEL):
+                    buildingRows.append(row)
+                    buildingCells.append(cellIndex(constr.coords))
+
+    batch = StateBatch()
+    batch.size = size
+    batch.playerId = playerId
+    batch.foodCounts = numpy.array(foodCounts, dtype=int).reshape((size, 2))
+    batch.ants = makePlane(size, antRows, antCells)
+    batch.food = makePlane(size, foodRows, foodCells)
+    batch.buildings = makePlane(size, buildingRows, buildingCells)
+    batch.workerStates = numpy.array(workerStates, dtype=int)
+    batch.workerCells = numpy.array(workerCells, dtype=int)
+    batch.workerCarrying = numpy.array(workerCarrying, dtype=bool)
+    return batch
+
+##
+# makePlane
+#
+# Description: Returns an n by NUM_CELLS plane with the given cells set.  This
+# is a helper method for encodeStates.
+#
+# Parameters:
+#   size - the number of states (n)
+#   rows - the state of each cell to set
+#   cells - the index of each cell to set
+##
+def makePlane(size, rows, cells):
+    plane = numpy.zeros((size, NUM_CELLS), dtype=bool)
+    plane[rows, cells] = True
+    return plane
+
+##
+#ChildEncoder
+#Description: Encodes the children of a state as a StateBatch.  A child made
+#   by a MOVE_ANT is its parent with the ant moved (and perhaps the ant it
+#   killed removed), which the ANT_MOVED and ANT_REMOVED entries of the
+#   move's undo record tell (see Rules.py), so only those cells are kept for
+#   it and the rest is copied from the parent's encoding.  Any other child
+#   is encoded in full.
+#
+#   Give the encoder each child (with add) while the state is the child,
+#   then call finish.
+#
+#Variables:
+#   parent - the StateBatch of the parent alone
+#   playerId - the player whose workers and buildings are encoded
+#   workerIndex - the index of each of the parent's workers in parent's rows
+#   size - the number of children added
+#   vacated, entered, killed - the (child, cell) of each cell an ant left,
+#       moved onto or died on, as two lists
+#   movedWorkers, killedWorkers - the (child, worker index) of each worker
+#       that moved or died, as two lists
+#   movedCells - the cell each worker in movedWorkers moved to
+#   encoded - the (child, StateBatch) of each child encoded in full
+##
+class ChildEncoder(object):
+    __slots__ = ('parent', 'playerId', 'workerIndex', 'size', 'vacated', 'entered',
+                 'killed', 'movedWorkers', 'movedCells', 'killedWorkers', 'encoded')
+
+    ##
+    #__init__
+    #Description: Encodes the parent
+    #
+    #Parameters:
+    #   parent - the GameState the children are made from
+    #   playerId - the player whose workers and buildings to encode
+    ##
+    def __init__(self, parent, playerId):
+        self.parent = encodeStates([parent], playerId)
+        self.playerId = playerId
+        #the workers in the order encodeStates found them
+        self.workerIndex = {}
+        for inv in parent.inventories:
+            if inv.player == playerId:
+                for ant in inv.ants:
+                    if ant.type == WORKER:
+                        self.workerIndex[ant] = len(self.workerIndex)
+        self.size = 0
+        self.vacated = ([], [])
+        self.entered = ([], [])
+        self.killed = ([], [])
+        self.movedWorkers = ([], [])
+        self.movedCells = []
+        self.killedWorkers = ([], [])
+        self.encoded = []
+
+    ##
+    #add
+    #Description: Encodes the next child
+    #
+    #Parameters:
+    #   child - the state after the move (the parent itself, changed, will do)
+    #   record - the undo record applyMove returned for the move
+    #
+    #Return: True if the child was encoded from the parent:  it then differs
+    #   from the parent only in where an ant is, so it has the same winner
+    #   (if any) as the parent.
+    ##
+    def add(self, child, record):
+        row = self.size
+        self.size += 1
+        moved = None
+        killedAnt = None
+        for entry in record:
+            if entry[0] == ANT_MOVED:
+                moved = entry
+            elif entry[0] == ANT_REMOVED:
+                killedAnt = entry[1]
+        if moved is None:
+            self.encoded.append((row, encodeStates([child], self.playerId)))
+            return False
+
+        ant = moved[1]
+        cell = cellIndex(ant.coords)
+        addPair(self.vacated, row, cellIndex(moved[2]))
+        addPair(self.entered, row, cell)
+        index = self.workerIndex.get(ant)
+        if index is not None:
+            addPair(self.movedWorkers, row, index)
+            self.movedCells.append(cell)
+        if killedAnt is None:
+            return True
+        addPair(self.killed, row, cellIndex(killedAnt.coords))
+        index = self.workerIndex.get(killedAnt)
+        if index is not None:
+            addPair(self.killedWorkers, row, index)
+        return False
+
+    ##
+    #finish
+    #Description: Returns the StateBatch of the children added, in order
+    ##
+    def finish(self):
+        size = self.size
+        parent = self.parent
+        numWorkers = len(parent.workerCells)
+
+        batch = StateBatch()
+        batch.size = size
+        batch.playerId = self.playerId
+        batch.foodCounts = numpy.repeat(parent.foodCounts, size, axis=0)
+        batch.food = numpy.repeat(parent.food, size, axis=0)
+        batch.buildings = numpy.repeat(parent.buildings, size, axis=0)
+        batch.ants = numpy.repeat(parent.ants, size, axis=0)
+        setCells(batch.ants, self.vacated, False)
+        setCells(batch.ants, self.entered, True)
+        setCells(batch.ants, self.killed, False)
+
+        #every child has each of the parent's workers, where it was
+        workerStates = numpy.repeat(numpy.arange(size), numWorkers)
+        workerCells = numpy.tile(parent.workerCells, size)
+        workerCarrying = numpy.tile(parent.workerCarrying, size)
+        keep = numpy.ones(size * numWorkers, dtype=bool)
+        if self.movedCells:
+            workerCells[workerRows(self.movedWorkers, numWorkers)] = self.movedCells
+        if self.killedWorkers[0]:
+            keep[workerRows(self.killedWorkers, numWorkers)] = False
+
+        #the children encoded in full replace what was copied from the parent
+        states = [workerStates]
+        cells = [workerCells]
+        carrying = [workerCarrying]
+        for row, encoded in self.encoded:
+            batch.foodCounts[row] = encoded.foodCounts[0]
+            batch.food[row] = encoded.food[0]
+            batch.buildings[row] = encoded.buildings[0]
+            batch.ants[row] = encoded.ants[0]
+            keep[row * numWorkers:(row + 1) * numWorkers] = False
+            states.append(encoded.workerStates + row)
+            cells.append(encoded.workerCells)
+            carrying.append(encoded.workerCarrying)
+        states[0] = workerStates[keep]
+        cells[0] = workerCells[keep]
+        carrying[0] = workerCarrying[keep]
+        batch.workerStates = numpy.concatenate(states)
+        batch.workerCells = numpy.concatenate(cells)
+        batch.workerCarrying = numpy.concatenate(carrying)
+        return batch
+
+##
+# addPair
+#
+# Description: Adds a (row, index) pair to a pair of lists.  This is a helper
+# method for ChildEncoder.
+##
+def addPair(pairs, row, index):
+    pairs[0].append(row)
+    pairs[1].append(index)
+
+##
+# setCells
+#
+# Description: Sets the (row, cell)s in a pair of lists (see addPair) of a
+# plane to a value.  This is a helper method for ChildEncoder.finish.
+##
+def setCells(plane, pairs, value):
+    if pairs[0]:
+        plane[pairs[0], pairs[1]] = value
+
+##
+# workerRows
+#
+# Description: Returns the rows of the (child, worker index) pairs in a pair of
+# lists in the worker rows ChildEncoder.finish copies from the parent.
+##
+def workerRows(pairs, numWorkers):
+    return numpy.array(pairs[0], dtype=int) * numWorkers + numpy.array(pairs[1], dtype=int)
+
+##
+# distanceMatrix
+#
+# Description: Returns a distance table (see AIPlayerUtils.getDistanceTable)
+# as a NUM_CELLS by NUM_CELLS NumPy array:  the steps from the cell src to
+# the cell dst are matrix[dst, src], as they are table[dst][src].  Tables are
+# built once per layout and so are the arrays.
+#
+# Parameters:
+#   table - a distance table
+##
+def distanceMatrix(table):
+    entry = DISTANCE_MATRICES.get(id(table))
+    if entry is None or entry[0] is not table:
+        if len(DISTANCE_MATRICES) >= MAX_DISTANCE_MATRICES:
+            DISTANCE_MATRICES.clear()
+        entry = DISTANCE_MATRICES[id(table)] = (table, numpy.array(table, dtype=int))
+    return entry[1]
@@ -0,0 +1,166 @@
+from Constants import *
+from Construction import CONSTR_STATS
+
+#
+# Bitboard.py
+#
+# The board is only 10x10 so any set of cells fits in a single (100 bit)
+# Python int:  the cell (x, y) is bit x * BOARD_LENGTH + y (the same index
+# CompactState uses).  A Bitboards object records where the ants and
+# constructions of a state are as such ints, so the move generators in
+# AIPlayerUtils can test for blocking ants, grass, food and the queen's
+# forbidden rows with a mask instead of searching the inventories.
+#
+# Bitboards are a snapshot:  they must be rebuilt after the state changes.
+#
+
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+
+#every cell on the board
+ALL_CELLS = (1 << NUM_CELLS) - 1
+
+#the cells in the first (y == 0) and last (y == BOARD_LENGTH - 1) row of
+#every column.  Shifting by one bit moves along a column so these must be
+#masked out first to keep cells from wrapping into the neighbouring column.
+FIRST_ROW = 0
+for x in xrange(0, BOARD_LENGTH):
+    FIRST_ROW |= 1 << (x * BOARD_LENGTH)
+LAST_ROW = FIRST_ROW << (BOARD_LENGTH - 1)
+
+#the two rows in the middle of the board that a queen may not enter
+QUEEN_FORBIDDEN = (FIRST_ROW << (BOARD_LENGTH / 2 - 1)) | (FIRST_ROW << (BOARD_LENGTH / 2))
+
+#the bit of every cell
+CELL_BITS = {}
+for x in xrange(0, BOARD_LENGTH):
+    for y in xrange(0, BOARD_LENGTH):
+        CELL_BITS[(x, y)] = 1 << (x * BOARD_LENGTH + y)
+
+#the cost of moving onto grass (everything else costs the default of 1)
+GRASS_COST = CONSTR_STATS[GRASS][MOVE_COST]
+
+##
+# cellBit
+#
+# Return: the bit of a cell (0 if it is not on the board)
+def cellBit(coords):
+    return CELL_BITS.get(tuple(coords), 0)
+
+##
+# pathBits
+#
+# Return: the set of the cells in a path (a list of coords)
+def pathBits(path):
+    bits = 0
+    for coord in path:
+        bits |= CELL_BITS.get(tuple(coord), 0)
+    return bits
+
+##
+# adjacentBits
+#
+# Return: the set of the cells that are next to (but not in) a set of cells
+def adjacentBits(bits):
+    return ((bits << BOARD_LENGTH) | (bits >> BOARD_LENGTH) |
+            ((bits & ~LAST_ROW) << 1) | ((bits & ~FIRST_ROW) >> 1)) & ALL_CELLS & ~bits
+
+##
+# adjacentCells
+#
+# Description: Lists the cells next to a given cell in the same order as
+# AIPlayerUtils.listAdjacent.
+#
+# Return: a list of (coords, bit) pairs (empty if coords is not on the board)
+def adjacentCells(coords):
+    bit = cellBit(coords)
+    if not bit:
+        return []
+    x = coords[0]
+    y = coords[1]
+    result = []
+    for adjBit, adjCoords in ((bit >> BOARD_LENGTH, (x - 1, y)),
+                              ((bit << BOARD_LENGTH) & ALL_CELLS, (x + 1, y)),
+                              ((bit & ~FIRST_ROW) >> 1, (x, y - 1)),
+                              ((bit & ~LAST_ROW) << 1, (x, y + 1))):
+        if adjBit:
+            result.append((adjCoords, adjBit))
+    return result
+
+##
+# grassBits
+#
+# Description: Finds where the grass is without building a whole Bitboards
+# (grass is neutral so only the NEUTRAL inventory is searched)
+#
+# Return: the set of the cells with grass on them
+def grassBits(state):
+    bits = 0
+    for constr in state.inventories[NEUTRAL].constrs:
+        if constr.type == GRASS:
+            bits |= CELL_BITS[constr.coords]
+    return bits
+
+##
+# antBits
+#
+# Return: the set of the cells with an ant on them
+def antBits(state):
+    bits = 0
+    for inv in state.inventories:
+        for ant in inv.ants:
+            bits |= CELL_BITS[ant.coords]
+    return bits
+
+
+##
+#Bitboards
+#Description: Where the ants and constructions of a state are, as sets of
+#   cells
+#
+#Variables:
+#   ants - every ant
+#   playerAnts - the ants of PLAYER_ONE and of PLAYER_TWO
+#   constrs - every construction
+#   grass, food, tunnels, anthills - the constructions of each type
+#   playerBuildings - the anthill and tunnels of PLAYER_ONE and of PLAYER_TWO
+##
+class Bitboards(object):
+    __slots__ = ('ants', 'playerAnts', 'constrs', 'grass', 'food', 'tunnels', 'anthills',
+                 'playerBuildings')
+
+    ##
+    #__init__
+    #Description: Records the contents of a state
+    #
+    #Parameters:
+    #   state - a GameState (or anything with the same inventories); the
+    #       board is not used
+    ##
+    def __init__(self, state):
+        playerAnts = [0, 0]
+        playerBuildings = [0, 0]
+        byType = [0] * (FOOD - ANTHILL + 1)
+        for inv in state.inventories:
+            for ant in inv.ants:
+                playerAnts[ant.player] |= CELL_BITS[ant.coords]
+            for constr in inv.constrs:
+                byType[constr.type - ANTHILL] |= CELL_BITS[constr.coords]
+                if constr.type in (ANTHILL, TUNNEL):
+                    playerBuildings[constr.player] |= CELL_BITS[constr.coords]
+        self.playerAnts = tuple(playerAnts)
+        self.playerBuildings = tuple(playerBuildings)
+        self.ants = playerAnts[PLAYER_ONE] | playerAnts[PLAYER_TWO]
+        self.anthills = byType[ANTHILL - ANTHILL]
+        self.tunnels = byType[TUNNEL - ANTHILL]
+        self.grass = byType[GRASS - ANTHILL]
+        self.food = byType[FOOD - ANTHILL]
+        self.constrs = self.anthills | self.tunnels | self.grass | self.food
+
+    ##
+    #moveCost
+    #Description: Returns the cost of moving onto the cell with the given bit
+    ##
+    def moveCost(self, bit):
+        if self.grass & bit:
+            return GRASS_COST
+        return 1
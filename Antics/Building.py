@@ -13,6 +13,7 @@ from Constants import *
 #       take before being captured.
 ##
 class Building(Construction):
+    __slots__ = ('player', 'captureHealth')
 
     ##
     #__init__
@@ -27,5 +28,15 @@ class Building(Construction):
         self.player = inputPlayer
         self.captureHealth = CONSTR_STATS[inputType][CAP_HEALTH]
     
+    ##
+    #clone
+    #Description: Returns a copy of this Building (without rerunning __init__)
+    ##
     def clone(self):
-        return Building(self.coords, self.type, self.player)
+        rtnBuilding = Building.__new__(Building)
+        rtnBuilding.coords = self.coords
+        rtnBuilding.type = self.type
+        rtnBuilding.movementCost = self.movementCost
+        rtnBuilding.player = self.player
+        rtnBuilding.captureHealth = self.captureHealth
+        return rtnBuilding
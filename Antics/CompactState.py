@@ -0,0 +1,597 @@
+from Constants import *
+from Ant import Ant
+from Construction import Construction, CONSTR_STATS
+from Building import Building
+from Zobrist import computeHash
+
+#
+# CompactState.py
+#
+# An alternative, array-backed representation of a GameState.  The whole
+# state (board contents, ant stats, constructions, food counts, phase and
+# turn) lives in a single bytearray so cloning it is one buffer copy instead
+# of hundreds of object allocations.  The usual GameState/Inventory/Ant
+# attributes are still available through lightweight view objects so the
+# routines in AIPlayerUtils (and the agents in the AI folder) can be handed a
+# CompactState in place of a GameState produced by GameState.fastclone.
+#
+# Like a fastclone()d GameState, a CompactState has no board (board is None).
+#
+# A CompactState is also cheap to send to another process:  it pickles as the
+# one buffer rather than an object per ant and construction.  ohta's agent
+# hands its worker processes a CompactState (see searchParallel), and each
+# worker expands it back with toGameState before searching.
+#
+
+#Layout of a single cell record (one per board cell)
+ANT_TYPE = 0        #ant type + 1 (0 means no ant)
+ANT_OWNER = 1       #player id of the ant's owner
+ANT_HEALTH = 2      #the ant's remaining health
+ANT_FLAGS = 3       #bit field of CARRYING_FLAG and MOVED_FLAG
+CONSTR_TYPE = 4     #construction type - ANTHILL + 1 (0 means no construction)
+CONSTR_OWNER = 5    #player id of the construction's owner (NEUTRAL for grass/food)
+CONSTR_HEALTH = 6   #capture health of the construction (NO_VALUE if it has none)
+CELL_SIZE = 8       #(the last byte of each record is unused padding)
+
+#Bits in the ANT_FLAGS byte
+CARRYING_FLAG = 1
+MOVED_FLAG = 2
+
+#stands in for None in fields that can't hold it
+NO_VALUE = 255
+
+#Layout of the header that follows the cell records
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+HEADER = NUM_CELLS * CELL_SIZE
+TURN_OFFSET = HEADER
+PHASE_OFFSET = HEADER + 1
+FOOD_OFFSET = HEADER + 2   #one byte per player
+DATA_SIZE = HEADER + 4
+
+##
+# cellIndex
+#
+# Return: the index of the record for a given coordinate
+def cellIndex(coords):
+    return coords[0] * BOARD_LENGTH + coords[1]
+
+##
+# cellCoords
+#
+# Return: the coordinate of the record at a given index
+def cellCoords(index):
+    return (index // BOARD_LENGTH, index % BOARD_LENGTH)
+
+
+##
+#AntView
+#Description: Presents the ant stored in a cell of a CompactState with the
+#   same attributes as an Ant.  Assigning to coords moves the ant's record to
+#   the new cell.
+#
+#Variables:
+#   state - the CompactState that holds the ant
+#   index - the cell index of the ant's record
+##
+class AntView(object):
+    __slots__ = ('state', 'index')
+
+    def __init__(self, inputState, inputIndex):
+        self.state = inputState
+        self.index = inputIndex
+
+    def _getCoords(self):
+        return cellCoords(self.index)
+
+    def _setCoords(self, coords):
+        data = self.state.data
+        oldOffset = self.index * CELL_SIZE
+        newIndex = cellIndex(coords)
+        if newIndex == self.index:
+            return
+        newOffset = newIndex * CELL_SIZE
+        data[newOffset:newOffset + ANT_FLAGS + 1] = data[oldOffset:oldOffset + ANT_FLAGS + 1]
+        data[oldOffset:oldOffset + ANT_FLAGS + 1] = bytearray(ANT_FLAGS + 1)
+        self.index = newIndex
+
+    def _getField(field):
+        return lambda self: self.state.data[self.index * CELL_SIZE + field]
+
+    def _setField(field):
+        def setter(self, value):
+            self.state.data[self.index * CELL_SIZE + field] = value
+        return setter
+
+    def _getFlag(flag):
+        return lambda self: (self.state.data[self.index * CELL_SIZE + ANT_FLAGS] & flag) != 0
+
+    def _setFlag(flag):
+        def setter(self, value):
+            offset = self.index * CELL_SIZE + ANT_FLAGS
+            if value:
+                self.state.data[offset] |= flag
+            else:
+                self.state.data[offset] &= ~flag & 0xFF
+        return setter
+
+    def _getType(self):
+        return self.state.data[self.index * CELL_SIZE + ANT_TYPE] - 1
+
+    def _setType(self, value):
+        self.state.data[self.index * CELL_SIZE + ANT_TYPE] = value + 1
+
+    coords = property(_getCoords, _setCoords)
+    type = property(_getType, _setType)
+    def _setHealth(self, value):
+        #a dead ant's health can go negative but a byte can't
+        self.state.data[self.index * CELL_SIZE + ANT_HEALTH] = max(value, 0)
+
+    player = property(_getField(ANT_OWNER), _setField(ANT_OWNER))
+    health = property(_getField(ANT_HEALTH), _setHealth)
+    carrying = property(_getFlag(CARRYING_FLAG), _setFlag(CARRYING_FLAG))
+    hasMoved = property(_getFlag(MOVED_FLAG), _setFlag(MOVED_FLAG))
+    del _getField, _setField, _getFlag, _setFlag
+
+    ##
+    # returns a detached Ant with the same stats as this one
+    def clone(self):
+        rtnAnt = Ant(self.coords, self.type, self.player)
+        rtnAnt.hasMoved = self.hasMoved
+        rtnAnt.carrying = self.carrying
+        rtnAnt.health = self.health
+        return rtnAnt
+
+    def __eq__(self, other):
+        return type(other) is AntView and other.state is self.state and other.index == self.index
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+
+##
+#ConstrView
+#Description: Presents the construction stored in a cell of a CompactState
+#   with the same attributes as a Construction (or Building).
+#
+#Variables:
+#   state - the CompactState that holds the construction
+#   index - the cell index of the construction's record
+##
+class ConstrView(object):
+    __slots__ = ('state', 'index')
+
+    def __init__(self, inputState, inputIndex):
+        self.state = inputState
+        self.index = inputIndex
+
+    def _getCoords(self):
+        return cellCoords(self.index)
+
+    def _getType(self):
+        return self.state.data[self.index * CELL_SIZE + CONSTR_TYPE] - 1 + ANTHILL
+
+    def _getPlayer(self):
+        return self.state.data[self.index * CELL_SIZE + CONSTR_OWNER]
+
+    def _setPlayer(self, value):
+        self.state.data[self.index * CELL_SIZE + CONSTR_OWNER] = value
+
+    def _getCaptureHealth(self):
+        value = self.state.data[self.index * CELL_SIZE + CONSTR_HEALTH]
+        if value == NO_VALUE:
+            return None
+        return value
+
+    def _setCaptureHealth(self, value):
+        if value == None:
+            value = NO_VALUE
+        self.state.data[self.index * CELL_SIZE + CONSTR_HEALTH] = value
+
+    def _getMovementCost(self):
+        return CONSTR_STATS[self.type][MOVE_COST]
+
+    coords = property(_getCoords)
+    type = property(_getType)
+    player = property(_getPlayer, _setPlayer)
+    captureHealth = property(_getCaptureHealth, _setCaptureHealth)
+    movementCost = property(_getMovementCost)
+
+    ##
+    # returns a detached Construction (or Building) equivalent to this one
+    def clone(self):
+        if self.type == ANTHILL or self.type == TUNNEL:
+            rtnConstr = Building(self.coords, self.type, self.player)
+            rtnConstr.captureHealth = self.captureHealth
+            return rtnConstr
+        return Construction(self.coords, self.type)
+
+    def __eq__(self, other):
+        return type(other) is ConstrView and other.state is self.state and other.index == self.index
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.state), self.index))
+
+
+##
+#CellListView
+#Description: A list-like view of all the ants (or constructions) in a
+#   CompactState that belong to one player.  Records are visited in cell
+#   order.  append/insert/remove write through to the state.
+#
+#Variables:
+#   state - the CompactState being viewed
+#   player - the id of the owner
+#   typeField - ANT_TYPE or CONSTR_TYPE
+##
+class CellListView(object):
+    __slots__ = ('state', 'player', 'typeField')
+
+    def __init__(self, inputState, inputPlayer, inputTypeField):
+        self.state = inputState
+        self.player = inputPlayer
+        self.typeField = inputTypeField
+
+    def _indexes(self):
+        data = self.state.data
+        typeField = self.typeField
+        ownerOffset = typeField + 1    #the owner byte always follows the type byte
+        player = self.player
+        for offset in xrange(0, HEADER, CELL_SIZE):
+            if data[offset + typeField] != 0 and data[offset + ownerOffset] == player:
+                yield offset // CELL_SIZE
+
+    def __iter__(self):
+        viewType = AntView if self.typeField == ANT_TYPE else ConstrView
+        for index in self._indexes():
+            yield viewType(self.state, index)
+
+    def __len__(self):
+        return sum(1 for index in self._indexes())
+
+    def __getitem__(self, i):
+        return list(self)[i]
+
+    def __contains__(self, item):
+        return item in list(self)
+
+    def index(self, item):
+        return list(self).index(item)
+
+    ##
+    # removes the record at position i and returns it as a detached Ant or
+    # Construction (a view of the emptied cell would be useless)
+    def pop(self, i = -1):
+        item = list(self)[i]
+        detached = item.clone()
+        self.remove(item)
+        return detached
+
+    def append(self, item):
+        if self.typeField == ANT_TYPE:
+            self.state.writeAnt(item)
+        else:
+            self.state.writeConstr(item, self.player)
+
+    def insert(self, i, item):
+        #records are ordered by cell so the position is irrelevant
+        self.append(item)
+
+    def remove(self, item):
+        index = cellIndex(item.coords)
+        offset = index * CELL_SIZE
+        data = self.state.data
+        if data[offset + self.typeField] == 0 or data[offset + self.typeField + 1] != self.player:
+            raise ValueError("CellListView.remove(x): x not in list")
+        if self.typeField == ANT_TYPE:
+            data[offset:offset + ANT_FLAGS + 1] = bytearray(ANT_FLAGS + 1)
+        else:
+            data[offset + CONSTR_TYPE:offset + CELL_SIZE] = bytearray(CELL_SIZE - CONSTR_TYPE)
+
+
+##
+#InventoryView
+#Description: Presents one player's part of a CompactState with the same
+#   attributes and methods as an Inventory.
+#
+#Variables:
+#   state - the CompactState being viewed
+#   player - the id of the player this inventory belongs to
+##
+class InventoryView(object):
+    __slots__ = ('state', 'player')
+
+    def __init__(self, inputState, inputPlayer):
+        self.state = inputState
+        self.player = inputPlayer
+
+    def _getFoodCount(self):
+        if self.player == NEUTRAL:
+            return 0
+        return self.state.data[FOOD_OFFSET + self.player]
+
+    def _setFoodCount(self, value):
+        self.state.data[FOOD_OFFSET + self.player] = value
+
+    def _getAnts(self):
+        return CellListView(self.state, self.player, ANT_TYPE)
+
+    def _getConstrs(self):
+        return CellListView(self.state, self.player, CONSTR_TYPE)
+
+    foodCount = property(_getFoodCount, _setFoodCount)
+    ants = property(_getAnts)
+    constrs = property(_getConstrs)
+
+    ##
+    # return the queen in this inventory
+    def getQueen(self):
+        for checkAnt in self.ants:
+            if checkAnt.type == QUEEN: return checkAnt
+
+        return None
+
+    ##
+    # return the anthill in this inventory
+    def getAnthill(self):
+        for checkConstruction in self.constrs:
+            if checkConstruction.type == ANTHILL: return checkConstruction
+
+        return None
+
+    ##
+    # construct a list of all the tunnels in this inventory
+    def getTunnels(self):
+        return [constr for constr in self.constrs if constr.type == TUNNEL]
+
+    ##
+    # return the ant in this inventory at the given coords (or None)
+    def getAntAt(self, coords):
+        index = cellIndex(coords)
+        offset = index * CELL_SIZE
+        data = self.state.data
+        if data[offset + ANT_TYPE] != 0 and data[offset + ANT_OWNER] == self.player:
+            return AntView(self.state, index)
+        return None
+
+    ##
+    # return the construction in this inventory at the given coords (or None)
+    def getConstrAt(self, coords):
+        index = cellIndex(coords)
+        offset = index * CELL_SIZE
+        data = self.state.data
+        if data[offset + CONSTR_TYPE] != 0 and data[offset + CONSTR_OWNER] == self.player:
+            return ConstrView(self.state, index)
+        return None
+
+    ##
+    # the records are their own index so there is nothing to clear
+    def clearIndexes(self):
+        pass
+
+    ##
+    # see Inventory.addAnt (records are kept in cell order)
+    def addAnt(self, ant):
+        self.state.writeAnt(ant)
+
+    ##
+    # see Inventory.insertAnt (the position is irrelevant)
+    def insertAnt(self, index, ant):
+        self.state.writeAnt(ant)
+
+    ##
+    # see Inventory.removeAnt.  The ant is found by its coords (it may be a
+    # detached Ant) and the ant that is returned is a detached copy.
+    def removeAnt(self, ant):
+        return self.removeRecord(self.ants, ant)
+
+    ##
+    # see Inventory.moveAnt
+    def moveAnt(self, ant, coords):
+        ant.coords = coords
+
+    ##
+    # see Inventory.addConstr
+    def addConstr(self, constr):
+        self.state.writeConstr(constr, self.player)
+
+    ##
+    # see Inventory.removeConstr
+    def removeConstr(self, constr):
+        return self.removeRecord(self.constrs, constr)
+
+    ##
+    # removes the record at item's coords from the given CellListView
+    #
+    # Return: (the record's position in the list, a detached copy of it)
+    def removeRecord(self, records, item):
+        cell = cellIndex(item.coords)
+        indexes = list(records._indexes())
+        if not cell in indexes:
+            raise ValueError("InventoryView.removeRecord(x): x not in list")
+        detached = records[indexes.index(cell)].clone()
+        records.remove(item)
+        return (indexes.index(cell), detached)
+
+    ##
+    # duplicate this inventory (the duplicate views the same state)
+    def clone(self):
+        return InventoryView(self.state, self.player)
+
+
+##
+#CompactState
+#Description: A GameState stored in a single bytearray.  See the comment at
+#   the top of this file.
+#
+#Variables:
+#   data - the bytearray holding the cell records and the header
+#   inventories - a tuple of InventoryViews for each player and NEUTRAL
+#   phase - The current phase of the game.
+#   whoseTurn - The ID of the Player who's turn it currently is.
+#   hashKey - The Zobrist key of the state or None (see GameState)
+##
+class CompactState(object):
+    __slots__ = ('data', '_inventories', 'hashKey')
+
+    #compact states never have a board (see GameState.fastclone)
+    board = None
+
+    ##
+    #__init__
+    #Description: Creates a new CompactState around an existing buffer.  Use
+    #   compactClone to build one from a GameState.
+    #
+    #Parameters:
+    #   inputData - a bytearray of DATA_SIZE bytes laid out as described above
+    #   inputHashKey - the Zobrist key of the state if it is known
+    ##
+    def __init__(self, inputData, inputHashKey = None):
+        self.data = inputData
+        self._inventories = None
+        self.hashKey = inputHashKey
+
+    def _getInventories(self):
+        if self._inventories is None:
+            self._inventories = (InventoryView(self, PLAYER_ONE),
+                                 InventoryView(self, PLAYER_TWO),
+                                 InventoryView(self, NEUTRAL))
+        return self._inventories
+
+    def _getPhase(self):
+        return self.data[PHASE_OFFSET]
+
+    def _setPhase(self, value):
+        self.data[PHASE_OFFSET] = value
+
+    def _getWhoseTurn(self):
+        return self.data[TURN_OFFSET]
+
+    def _setWhoseTurn(self, value):
+        self.data[TURN_OFFSET] = value
+
+    inventories = property(_getInventories)
+    phase = property(_getPhase, _setPhase)
+    whoseTurn = property(_getWhoseTurn, _setWhoseTurn)
+
+    ##
+    #writeAnt
+    #Description: stores the stats of an Ant (or AntView) in the cell at its
+    #   coordinates
+    ##
+    def writeAnt(self, ant):
+        offset = cellIndex(ant.coords) * CELL_SIZE
+        self.data[offset + ANT_TYPE] = ant.type + 1
+        self.data[offset + ANT_OWNER] = ant.player
+        self.data[offset + ANT_HEALTH] = max(ant.health, 0)
+        self.data[offset + ANT_FLAGS] = (CARRYING_FLAG if ant.carrying else 0) | \
+                                        (MOVED_FLAG if ant.hasMoved else 0)
+
+    ##
+    #writeConstr
+    #Description: stores a Construction (or Building or ConstrView) in the cell
+    #   at its coordinates.  Constructions without a player attribute are
+    #   recorded as belonging to the given owner.
+    ##
+    def writeConstr(self, constr, owner):
+        offset = cellIndex(constr.coords) * CELL_SIZE
+        captureHealth = getattr(constr, 'captureHealth', None)
+        self.data[offset + CONSTR_TYPE] = constr.type - ANTHILL + 1
+        self.data[offset + CONSTR_OWNER] = getattr(constr, 'player', owner)
+        self.data[offset + CONSTR_HEALTH] = NO_VALUE if captureHealth == None else captureHealth
+
+    ##
+    #getHashKey
+    #Description: see GameState.getHashKey
+    ##
+    def getHashKey(self):
+        if self.hashKey == None:
+            self.hashKey = computeHash(self)
+        return self.hashKey
+
+    ##
+    #updateHash
+    #Description: see GameState.updateHash
+    ##
+    def updateHash(self, delta):
+        if self.hashKey != None:
+            self.hashKey ^= delta
+
+    ##
+    #coordLookup
+    #Description: see GameState.coordLookup
+    ##
+    def coordLookup(self, coords, playerId):
+        if coords == None or playerId == None:
+            return None
+
+        if playerId == PLAYER_ONE:
+            return coords
+        else:
+            return (BOARD_LENGTH - 1 - coords[0], BOARD_LENGTH - 1 - coords[1])
+
+    ##
+    #clone
+    #Description: Returns a deep copy of itself (a single buffer copy)
+    ##
+    def clone(self):
+        return CompactState(bytearray(self.data), self.hashKey)
+
+    ##
+    #fastclone
+    #Description: same as clone (a CompactState never has a board)
+    ##
+    def fastclone(self):
+        return CompactState(bytearray(self.data), self.hashKey)
+
+    ##
+    #toGameState
+    #Description: Expands this state back into ordinary Ant, Construction and
+    #   Inventory objects.
+    #
+    #Return: an equivalent GameState with no board (like fastclone)
+    ##
+    def toGameState(self):
+        #avoid a circular import (GameState doesn't need this module)
+        from GameState import GameState
+        from Inventory import Inventory
+
+        newInventories = []
+        for inv in self.inventories:
+            ants = [ant.clone() for ant in inv.ants]
+            constrs = [constr.clone() for constr in inv.constrs]
+            newInventories.append(Inventory(inv.player, ants, constrs, inv.foodCount))
+        newState = GameState(None, newInventories, self.phase, self.whoseTurn)
+        newState.hashKey = self.hashKey
+        return newState
+
+
+##
+# compactClone
+#
+# Description: Creates a CompactState copy of a GameState (with or without
+# a board).  The original state is not modified.
+#
+# Parameters:
+#   state - the GameState to copy
+#
+# Return: a new CompactState
+##
+def compactClone(state):
+    result = CompactState(bytearray(DATA_SIZE))
+    for inv in state.inventories:
+        for ant in inv.ants:
+            result.writeAnt(ant)
+        for constr in inv.constrs:
+            result.writeConstr(constr, inv.player)
+        if inv.player != NEUTRAL:
+            result.data[FOOD_OFFSET + inv.player] = inv.foodCount
+    result.data[TURN_OFFSET] = state.whoseTurn
+    result.data[PHASE_OFFSET] = state.phase
+    result.hashKey = state.hashKey
+    return result
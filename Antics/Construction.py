@@ -21,6 +21,7 @@ CONSTR_STATS.append((1,None,None)) #Food
 #       down and to the right.
 ##
 class Construction(object):
+    __slots__ = ('coords', 'type', 'movementCost')
 
     ##
     #__init__
@@ -35,5 +36,13 @@ class Construction(object):
         self.type = inputType
         self.movementCost = CONSTR_STATS[inputType][MOVE_COST]
     
+    ##
+    #clone
+    #Description: Returns a copy of this Construction (without rerunning __init__)
+    ##
     def clone(self):
-        return Construction(self.coords, self.type)
\ No newline at end of file
+        rtnConstr = Construction.__new__(Construction)
+        rtnConstr.coords = self.coords
+        rtnConstr.type = self.type
+        rtnConstr.movementCost = self.movementCost
+        return rtnConstr
\ No newline at end of file
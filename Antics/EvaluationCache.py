@@ -0,0 +1,179 @@
+from collections import deque
+
+#
+# EvaluationCache.py
+#
+# A search evaluates the same state many times:  along different paths to it
+# within one search and again in the searches for the following moves of the
+# same turn.  An EvaluationCache remembers the values an evaluation function
+# gave, keyed by the state's Zobrist key (see Zobrist.py and
+# GameState.getHashKey) and the player the state was valued for, so any
+# agent can look a value up instead of working it out again.
+#
+# The cache holds at most a fixed number of values.  When it is full the
+# value used least recently is dropped to make room.  Every use of a value is
+# logged in a queue with the time of the use (a count of uses), and the value
+# also remembers the time of its last use:  the first value in the queue
+# whose last use is the one logged is the least recently used (the values
+# before it have been used again since).  The queue is rebuilt from the values,
+# in order of their last use, when it gets too long.  The counters help to
+# choose the limit:
+#   hits - lookups that found a value
+#   misses - lookups that didn't
+#   stores - how many times store was called
+#   evictions - values dropped to make room for a new one
+#
+# A value must depend only on the state and the player, so an agent whose
+# evaluation depends on anything else (settings it changes, say) must clear
+# the cache when that changes.
+#
+
+DEFAULT_CACHE_LIMIT = 1 << 16
+
+#the queue is rebuilt when it holds this many times the number of values
+QUEUE_FACTOR = 4
+
+##
+#EvaluationCache
+#Description: A least recently used cache of state values keyed by Zobrist
+#   key and player
+#
+#Variables:
+#   limit - the most values the cache holds
+#   entries - a dict of [value, time of last use] keyed by (Zobrist key,
+#       player id)
+#   uses - a deque of the (key, time) of each use, oldest first
+#   clock - the time of the last use
+#   hits, misses, stores, evictions - the counters described above
+##
+class EvaluationCache(object):
+
+    ##
+    #__init__
+    #Description: Creates an empty cache
+    #
+    #Parameters:
+    #   limit - the most values the cache may hold (int)
+    ##
+    def __init__(self, limit = DEFAULT_CACHE_LIMIT):
+        self.limit = limit
+        self.clear()
+
+    ##
+    #clear
+    #Description: Removes every value and resets the counters
+    ##
+    def clear(self):
+        self.entries = {}
+        self.uses = deque()
+        self.clock = 0
+        self.resetCounters()
+
+    ##
+    #resetCounters
+    #Description: Sets every counter back to zero (leaving the values)
+    ##
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    ##
+    #lookup
+    #Description: Finds the value of a state
+    #
+    #Parameters:
+    #   key - the state's Zobrist key
+    #   playerId - the player the state is valued for
+    #
+    #Return: the value or None if the cache doesn't have it
+    ##
+    def lookup(self, key, playerId):
+        entry = self.entries.get((key, playerId))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.use((key, playerId), entry)
+        return entry[0]
+
+    ##
+    #store
+    #Description: Records the value of a state, dropping the least recently
+    #   used value if the cache is full
+    #
+    #Parameters:
+    #   key - the state's Zobrist key
+    #   playerId - the player the state is valued for
+    #   value - the value (anything but None)
+    ##
+    def store(self, key, playerId, value):
+        self.stores += 1
+        entry = self.entries.get((key, playerId))
+        if entry is None:
+            if len(self.entries) >= self.limit:
+                self.evict()
+            entry = self.entries[(key, playerId)] = [value, 0]
+        else:
+            entry[0] = value
+        self.use((key, playerId), entry)
+
+    ##
+    #use
+    #Description: Logs a use of a value
+    #
+    #Parameters:
+    #   entryKey - the (Zobrist key, player id) of the value
+    #   entry - the value's [value, time of last use]
+    ##
+    def use(self, entryKey, entry):
+        self.clock += 1
+        entry[1] = self.clock
+        self.uses.append((entryKey, self.clock))
+        if len(self.uses) > QUEUE_FACTOR * self.limit:
+            self.uses = deque(sorted(((entryKey, entry[1]) for entryKey, entry
+                                      in self.entries.iteritems()), key=lambda use: use[1]))
+
+    ##
+    #evict
+    #Description: Drops the value used least recently
+    ##
+    def evict(self):
+        while True:
+            entryKey, time = self.uses.popleft()
+            entry = self.entries.get(entryKey)
+            if entry is not None and entry[1] == time:
+                del self.entries[entryKey]
+                self.evictions += 1
+                return
+
+    ##
+    #getValue
+    #Description: Returns the value of a state from the cache, evaluating
+    #   the state (and caching the value) if it isn't there
+    #
+    #Parameters:
+    #   state - a GameState
+    #   playerId - the player the state is valued for
+    #   evaluate - a function that takes the state and returns its value
+    #       for the player
+    ##
+    def getValue(self, state, playerId, evaluate):
+        key = state.getHashKey()
+        value = self.lookup(key, playerId)
+        if value is None:
+            value = evaluate(state)
+            self.store(key, playerId, value)
+        return value
+
+    ##
+    #getCounters
+    #Description: Returns the counters (for reports)
+    #
+    #Return: a dict of each counter keyed by its name
+    ##
+    def getCounters(self):
+        return { 'hits' : self.hits, 'misses' : self.misses,
+                 'stores' : self.stores, 'evictions' : self.evictions,
+                 'entries' : len(self.entries) }
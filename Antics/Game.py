@@ -9,6 +9,9 @@ from Building import *
 from Location import *
 from Ant import *
 from Move import *
+from Zobrist import *
+from PerspectiveState import PerspectiveState
+from Rules import *
 
 ##
 #Game
@@ -182,9 +185,9 @@ class Game(object):
             else:
                 #create a copy of the state to share with the player
                 theState = self.state.clone()
-                #if the player is player two, flip the board
+                #if the player is player two, present it from their side
                 if theState.whoseTurn == PLAYER_TWO:
-                    theState.flipBoard()
+                    theState = PerspectiveState(theState)
 
             if self.state.phase == SETUP_PHASE_1 or self.state.phase == SETUP_PHASE_2:
                 currentPlayer = self.currentPlayers[self.state.whoseTurn]
@@ -234,9 +237,11 @@ class Game(object):
                         self.state.board[target[0]][target[1]].constr = constr
                         if constr.type == ANTHILL or constr.type == TUNNEL:
                             #update the inventory
-                            self.state.inventories[self.state.whoseTurn].constrs.append(constr)
+                            self.state.inventories[self.state.whoseTurn].addConstr(constr)
+                            self.state.updateHash(constrKey(constr, self.state.whoseTurn))
                         else:  #grass and food
-                            self.state.inventories[NEUTRAL].constrs.append(constr)
+                            self.state.inventories[NEUTRAL].addConstr(constr)
+                            self.state.updateHash(constrKey(constr, NEUTRAL))
                     
                     #if AI mode, pause to observe move until next or continue is clicked
                     self.pauseForAIMode()
@@ -253,7 +258,7 @@ class Game(object):
                                 constrsToPlace += [Construction(None, GRASS) for i in xrange(0,9)]
                             elif self.state.whoseTurn == PLAYER_TWO:
                                 constrsToPlace += [Construction(None, FOOD) for i in xrange(0,2)]
-                                self.state.phase = SETUP_PHASE_2
+                                self.setPhase(SETUP_PHASE_2)
                         elif self.state.phase == SETUP_PHASE_2:
                             if self.state.whoseTurn == PLAYER_ONE:
                                 constrsToPlace += [Construction(None, FOOD) for i in xrange(0,2)]
@@ -278,19 +283,23 @@ class Game(object):
                                 self.state.board[p1Worker.coords[0]][p1Worker.coords[1]].ant = p1Worker
                                 self.state.board[p2Worker.coords[0]][p2Worker.coords[1]].ant = p2Worker
                                 #add the queens to the inventories
-                                p1inventory.ants.append(p1Queen)
-                                p2inventory.ants.append(p2Queen)
-                                p1inventory.ants.append(p1Worker)
-                                p2inventory.ants.append(p2Worker)
+                                p1inventory.addAnt(p1Queen)
+                                p2inventory.addAnt(p2Queen)
+                                p1inventory.addAnt(p1Worker)
+                                p2inventory.addAnt(p2Worker)
+                                for ant in (p1Queen, p2Queen, p1Worker, p2Worker):
+                                    self.state.updateHash(antKey(ant))
                                 #give the players the initial food
+                                self.state.updateHash(foodKey(PLAYER_ONE, p1inventory.foodCount) ^ foodKey(PLAYER_ONE, 1))
+                                self.state.updateHash(foodKey(PLAYER_TWO, p2inventory.foodCount) ^ foodKey(PLAYER_TWO, 1))
                                 p1inventory.foodCount = 1
                                 p2inventory.foodCount = 1
                                 #change to play phase
                                 self.ui.notify("")
-                                self.state.phase = PLAY_PHASE
+                                self.setPhase(PLAY_PHASE)
                                 
                         #change player turn in state
-                        self.state.whoseTurn = (self.state.whoseTurn + 1) % 2
+                        self.setWhoseTurn((self.state.whoseTurn + 1) % 2)
                             
                 else:
                     if not type(currentPlayer) is HumanPlayer.HumanPlayer:
@@ -337,18 +346,8 @@ class Game(object):
                 if validMove:
                     #check move type
                     if move.moveType == MOVE_ANT:
-                        startCoord = move.coordList[0]
-                        endCoord = move.coordList[-1]
-                        
-                        #take ant from start coord
-                        antToMove = self.state.board[startCoord[0]][startCoord[1]].ant
-                        #change ant's coords and hasMoved status
-                        antToMove.coords = (endCoord[0], endCoord[1])
-                        antToMove.hasMoved = True
-                        #remove ant from location
-                        self.state.board[startCoord[0]][startCoord[1]].ant = None
-                        #put ant at last loc in coordList
-                        self.state.board[endCoord[0]][endCoord[1]].ant = antToMove
+                        #move the ant (see Rules.py)
+                        antToMove = applyAntMove(self.state, move)
                         
                         #clear all highlights after move happens
                         self.ui.coordList = []
@@ -372,22 +371,8 @@ class Game(object):
                         self.ui.attackList = []
                         
                     elif move.moveType == BUILD:
-                        coord = move.coordList[0]
-                        currentPlayerInv = self.state.inventories[self.state.whoseTurn]
-                                                 
-                        #subtract the cost of the item from the player's food count
-                        if move.buildType == TUNNEL:
-                            currentPlayerInv.foodCount -= CONSTR_STATS[move.buildType][BUILD_COST]
-                            
-                            tunnel = Building(coord, TUNNEL, self.state.whoseTurn)
-                            self.state.board[coord[0]][coord[1]].constr = tunnel
-                        else:
-                            currentPlayerInv.foodCount -= UNIT_STATS[move.buildType][COST]
-                            
-                            ant = Ant(coord, move.buildType, self.state.whoseTurn)
-                            ant.hasMoved = True
-                            self.state.board[coord[0]][coord[1]].ant = ant
-                            self.state.inventories[self.state.whoseTurn].ants.append(ant)
+                        #build the ant or tunnel and pay for it (see Rules.py)
+                        applyBuild(self.state, move)
                         
                         #if AI mode, pause to observe move until next or continue is clicked
                         self.pauseForAIMode()
@@ -400,31 +385,11 @@ class Game(object):
                         
                     elif move.moveType == END:
                         #take care of end of turn business for ants and contructions
-                        for ant in self.state.inventories[self.state.whoseTurn].ants:
-                            constrUnderAnt = self.state.board[ant.coords[0]][ant.coords[1]].constr
-                            if constrUnderAnt != None:
-                                #if constr is enemy's and ant hasnt moved, affect capture health of buildings
-                                if type(constrUnderAnt) is Building and not ant.hasMoved and not constrUnderAnt.player == self.state.whoseTurn:
-                                    constrUnderAnt.captureHealth -= 1
-                                    if constrUnderAnt.captureHealth == 0 and constrUnderAnt.type != ANTHILL:
-                                        constrUnderAnt.player = self.state.whoseTurn
-                                        constrUnderAnt.captureHealth = CONSTR_STATS[constrUnderAnt.type][CAP_HEALTH]
-                                #have all worker ants on food sources gather food
-                                elif constrUnderAnt.type == FOOD and ant.type == WORKER:
-                                    ant.carrying = True
-                                #deposit carried food (only workers carry)
-                                elif (constrUnderAnt.type == ANTHILL or constrUnderAnt.type == TUNNEL) and ant.carrying == True:
-                                    self.state.inventories[self.state.whoseTurn].foodCount += 1
-                                    ant.carrying = False
-                            
-                            #reset hasMoved on all ants of player
-                            ant.hasMoved = False   
+                        #and switch whose turn it is (see Rules.py)
+                        applyEndTurn(self.state)
                             
                         #clear any currently highlighted squares
                         self.ui.coordList = []
-                        
-                        #switch whose turn it is
-                        self.state.whoseTurn = (self.state.whoseTurn + 1) % 2
 
                         #notify player which AI is acting
                         nextPlayerName = self.players[self.state.whoseTurn][0].author
@@ -461,7 +426,7 @@ class Game(object):
         if self.state.phase != MENU_PHASE:
             #check mode for appropriate response to game over
             if self.mode == HUMAN_MODE:
-                self.state.phase = MENU_PHASE
+                self.setPhase(MENU_PHASE)
                                          
                 #notify the user of the winner
                 if self.winner == PLAYER_ONE:
@@ -472,7 +437,7 @@ class Game(object):
                 self.errorNotify = True
 
             if self.mode == AI_MODE:
-                self.state.phase = MENU_PHASE
+                self.setPhase(MENU_PHASE)
                                          
                 #notify the user of the winner
                 winnerName = self.players[self.winner][0].author
@@ -516,7 +481,7 @@ class Game(object):
                 else:
                     #setup game to run again
                     self.mode = TOURNAMENT_MODE
-                    self.state.phase = SETUP_PHASE_1
+                    self.setPhase(SETUP_PHASE_1)
                 
                     #get players from next pairing
                     playerOneId = self.gamesToPlay[0][0][0]
@@ -542,6 +507,28 @@ class Game(object):
         self.currentPlayers[id].registerWin(True)
         self.currentPlayers[(id + 1) % 2].registerWin(False)
     
+    ##
+    #setPhase
+    #Description: Changes the phase of the game (and the state's Zobrist key)
+    #
+    #Parameters:
+    #   phase - the new phase (int)
+    ##
+    def setPhase(self, phase):
+        self.state.updateHash(phaseKey(self.state.phase) ^ phaseKey(phase))
+        self.state.phase = phase
+
+    ##
+    #setWhoseTurn
+    #Description: Changes whose turn it is (and the state's Zobrist key)
+    #
+    #Parameters:
+    #   playerId - the id of the player whose turn it is now (int)
+    ##
+    def setWhoseTurn(self, playerId):
+        self.state.updateHash(turnKey(self.state.whoseTurn) ^ turnKey(playerId))
+        self.state.whoseTurn = playerId
+
     ##
     #resolveAttack 
     #Description: Checks a player wants to attack and takes appropriate action.
@@ -553,12 +540,9 @@ class Game(object):
     def resolveAttack(self, attackingAnt, currentPlayer):
         #check if player wants to attack
         validAttackCoords = []
-        opponentId = (self.state.whoseTurn + 1) % 2
-        range = UNIT_STATS[attackingAnt.type][RANGE]
-        for ant in self.state.inventories[opponentId].ants:
-            if self.isValidAttack(attackingAnt, ant.coords):
-                #keep track of valid attack coords (flipped for player two)
-                validAttackCoords.append(self.state.coordLookup(ant.coords, currentPlayer.playerId))
+        for ant in listAttackTargets(self.state, attackingAnt):
+            #keep track of valid attack coords (flipped for player two)
+            validAttackCoords.append(self.state.coordLookup(ant.coords, currentPlayer.playerId))
         if validAttackCoords != []:
             #give instruction to human player
             if type(currentPlayer) is HumanPlayer.HumanPlayer:
@@ -587,7 +571,7 @@ class Game(object):
                 #Create a clone of the state to give to the player
                 theState = self.state.clone()
                 if theState.whoseTurn == PLAYER_TWO:
-                    theState.flipBoard()
+                    theState = PerspectiveState(theState)
                         
                 #get the attack from the player (flipped for player two)
                 attackCoord = self.state.coordLookup(currentPlayer.getAttack(theState, attackingAnt.clone(), validAttackCoords), currentPlayer.playerId)
@@ -609,16 +593,9 @@ class Game(object):
                 self.expectingAttack = False
                 currentPlayer.coordList = []
             
-            #decrement ants health
+            #decrement ants health, removing it if it dies (see Rules.py)
             attackedAnt = self.state.board[attackCoord[0]][attackCoord[1]].ant
-            attackedAnt.health -= UNIT_STATS[attackingAnt.type][ATTACK]
-            
-            #check for dead ant
-            if attackedAnt.health <= 0:
-                #remove dead ant from board
-                self.state.board[attackCoord[0]][attackCoord[1]].ant = None
-                #remove dead ant from inventory
-                self.state.inventories[opponentId].ants.remove(attackedAnt)
+            applyAttack(self.state, attackingAnt, attackedAnt)
                 
             #if AI mode, pause to observe attack until next or continue is clicked
             self.pauseForAIMode()
@@ -634,6 +611,8 @@ class Game(object):
         p2Inventory = Inventory(PLAYER_TWO, [], [], 0)
         neutralInventory = Inventory(NEUTRAL, [], [], 0)
         self.state = GameState(board, [p1Inventory, p2Inventory, neutralInventory], MENU_PHASE, PLAYER_ONE)
+        #compute the state's Zobrist key now so it is maintained from here on
+        self.state.getHashKey()
         self.currentPlayers = []
         self.mode = None
         self.errorNotify = False
@@ -1188,17 +1167,7 @@ class Game(object):
     #Returns: True if the player with playerId has won the game.
     ##
     def hasWon(self, playerId):
-        opponentId = (playerId + 1) % 2
-        
-        if ((self.state.phase == PLAY_PHASE) and 
-        ((self.state.inventories[opponentId].getQueen() == None) or
-        (self.state.inventories[opponentId].getAnthill().captureHealth <= 0) or
-        (self.state.inventories[playerId].foodCount >= FOOD_GOAL) or
-        (self.state.inventories[opponentId].foodCount == 0 and 
-            len(self.state.inventories[opponentId].ants) == 1))):
-            return True
-        else:
-            return False
+        return playerHasWon(self.state, playerId)
      
     ##
     #pauseForAIMode
@@ -1299,7 +1268,7 @@ class Game(object):
 
         #if we are resetting, set the phase to MENU_PHASE with no mode
         if reset:
-            self.state.phase = MENU_PHASE
+            self.setPhase(MENU_PHASE)
             self.mode = None
         
         if self.mode == None:
@@ -1369,7 +1338,7 @@ class Game(object):
             self.currentPlayers = tempCurrent
                  
             #change the phase to setup
-            self.state.phase = SETUP_PHASE_1
+            self.setPhase(SETUP_PHASE_1)
             
     ##
     #tourneyPathCallback
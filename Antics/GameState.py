@@ -3,6 +3,7 @@ from Constants import *
 from Inventory import Inventory
 from Building import Building
 from Location import *
+from Zobrist import computeHash
 
 def addCoords(tuple1, tuple2):
     if len(tuple1) != len(tuple2):
@@ -26,6 +27,13 @@ def subtractCoords(tuple1, tuple2):
 #   inventories - A tuple containing the Inventory for each player.
 #   phase - The current phase of the game.
 #    whoseTurn - The ID of the Player who's turn it currently is.
+#   hashKey - The Zobrist key of the state or None if it hasn't been computed
+#       yet (see Zobrist.py and getHashKey)
+#
+# Note:  the grass and food in the NEUTRAL inventory never change during play
+# so clone and fastclone share them between a state and its copies instead of
+# copying them.  They must never be modified in place (flipBoard replaces them
+# with flipped copies).
 ##
 class GameState(object):
 
@@ -45,6 +53,32 @@ class GameState(object):
         self.inventories = inputInventories
         self.phase = inputPhase
         self.whoseTurn = inputTurn
+        self.hashKey = None
+
+    ##
+    #getHashKey
+    #Description: Returns the Zobrist key of this state, computing it the
+    #   first time it is needed.  From then on, anything that modifies the state
+    #   keeps the key up to date via updateHash.
+    #
+    #Return: a 64-bit int
+    ##
+    def getHashKey(self):
+        if self.hashKey == None:
+            self.hashKey = computeHash(self)
+        return self.hashKey
+
+    ##
+    #updateHash
+    #Description: XORs the given Zobrist key(s) into the key of this state.
+    #   Does nothing if the key hasn't been computed yet.
+    #
+    #Parameters:
+    #   delta - the XOR of the keys of everything that changed (int)
+    ##
+    def updateHash(self, delta):
+        if self.hashKey != None:
+            self.hashKey ^= delta
 
     ##
     #coordLookup
@@ -73,11 +107,27 @@ class GameState(object):
             
         self.board.reverse()
         
-        for inv in self.inventories:
+        for inv in self.inventories[PLAYER_ONE:PLAYER_TWO + 1]:
             for ant in inv.ants:
                 ant.coords = self.coordLookup(ant.coords, PLAYER_TWO)
             for constr in inv.constrs:
                 constr.coords = self.coordLookup(constr.coords, PLAYER_TWO)
+            inv.clearIndexes()
+
+        #the neutral constructions may be shared with other states so they
+        #are replaced with flipped copies
+        neutralInv = self.inventories[NEUTRAL]
+        flipped = []
+        for constr in neutralInv.constrs:
+            newConstr = constr.clone()
+            newConstr.coords = self.coordLookup(constr.coords, PLAYER_TWO)
+            self.board[newConstr.coords[0]][newConstr.coords[1]].constr = newConstr
+            flipped.append(newConstr)
+        neutralInv.constrs = flipped
+        neutralInv.clearIndexes()
+
+        #every coordinate changed so the key must be recomputed
+        self.hashKey = None
       
     ##
     #clearConstrs
@@ -119,12 +169,14 @@ class GameState(object):
                     ants1.append(newLoc.ant)
                 elif newLoc.ant != None and newLoc.ant.player == PLAYER_TWO:
                     ants2.append(newLoc.ant)
-        for constr in self.inventories[NEUTRAL].constrs:
-            cons3.append(constr.clone())
+        #grass and food are shared (see the note above)
+        cons3 = self.inventories[NEUTRAL].constrs[:]
         newInventories = [Inventory(PLAYER_ONE, ants1, cons1, food1),
                           Inventory(PLAYER_TWO, ants2, cons2, food2),
                           Inventory(NEUTRAL, [], cons3, 0) ]
-        return GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState = GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState.hashKey = self.hashKey
+        return newState
 
 
     ##
@@ -143,12 +195,10 @@ class GameState(object):
         ants2 = [ None ] * len(self.inventories[PLAYER_TWO].ants)
         cons1 = [ None ] * len(self.inventories[PLAYER_ONE].constrs)
         cons2 = [ None ] * len(self.inventories[PLAYER_TWO].constrs)
-        cons3 = [ None ] * len(self.inventories[NEUTRAL].constrs)
         antIndex1 = 0
         antIndex2 = 0
         conIndex1 = 0
         conIndex2 = 0
-        conIndex3 = 0
 
         #clone all the entries in the inventories
         for ant in self.inventories[PLAYER_ONE].ants:
@@ -163,9 +213,8 @@ class GameState(object):
         for constr in self.inventories[PLAYER_TWO].constrs:
             cons2[conIndex2] = constr.clone()
             conIndex2 += 1
-        for constr in self.inventories[NEUTRAL].constrs:
-            cons3[conIndex3] = constr.clone()
-            conIndex3 += 1
+        #grass and food are shared (see the note above)
+        cons3 = self.inventories[NEUTRAL].constrs[:]
 
         #clone the list of inventory objects
         food1 = self.inventories[PLAYER_ONE].foodCount
@@ -174,4 +223,6 @@ class GameState(object):
                            Inventory(PLAYER_TWO, ants2, cons2, food2),
                            Inventory(NEUTRAL, [], cons3, 0) ]
         
-        return GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState = GameState(newBoard, newInventories, self.phase, self.whoseTurn)
+        newState.hashKey = self.hashKey
+        return newState
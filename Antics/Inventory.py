@@ -11,8 +11,17 @@ from Constants import *
 #    anthill - The player's anthill
 #    constrs - An array of all the Player's Constructions
 #   foodCount - The amount of food that the player has to use
+#   antIndex - A dictionary of the player's ants keyed by their coords (or
+#       None until getAntAt builds it)
+#   constrIndex - A dictionary of the player's Constructions keyed by their
+#       coords (or None until getConstrAt builds it)
+#
+# Note:  once an index has been built it is only kept up to date by the
+# methods below (addAnt, moveAnt, removeAnt, etc.).  Code that changes the
+# ants or constrs lists or an ant's coords directly must call clearIndexes.
 ##
 class Inventory(object):
+    __slots__ = ('player', 'ants', 'constrs', 'foodCount', 'antIndex', 'constrIndex')
 
     ##
     #__init__
@@ -28,6 +37,8 @@ class Inventory(object):
         self.ants = antArray
         self.constrs = inputConstructions      
         self.foodCount = inputFood
+        self.antIndex = None
+        self.constrIndex = None
         
     ##
     # return the queen in this inventory
@@ -62,7 +73,81 @@ class Inventory(object):
                 result.append(checkConstruction)
         
         return result
-        
+
+    ##
+    # return the ant in this inventory at the given coords (or None)
+    def getAntAt(self, coords):
+        if self.antIndex == None:
+            self.antIndex = {}
+            for ant in (self.ants or []):
+                self.antIndex[ant.coords] = ant
+        return self.antIndex.get(coords)
+
+    ##
+    # return the construction in this inventory at the given coords (or None)
+    def getConstrAt(self, coords):
+        if self.constrIndex == None:
+            self.constrIndex = {}
+            for constr in (self.constrs or []):
+                self.constrIndex[constr.coords] = constr
+        return self.constrIndex.get(coords)
+
+    ##
+    # discard the coordinate indexes (they are rebuilt when next needed)
+    def clearIndexes(self):
+        self.antIndex = None
+        self.constrIndex = None
+
+    ##
+    # add an ant to this inventory
+    def addAnt(self, ant):
+        self.insertAnt(len(self.ants), ant)
+
+    ##
+    # add an ant to this inventory at a given position in the ants list
+    def insertAnt(self, index, ant):
+        self.ants.insert(index, ant)
+        if self.antIndex != None:
+            self.antIndex[ant.coords] = ant
+
+    ##
+    # remove an ant from this inventory
+    #
+    # Return: a tuple of its former position in the ants list and the ant
+    def removeAnt(self, ant):
+        index = self.ants.index(ant)
+        del self.ants[index]
+        if self.antIndex != None and self.antIndex.get(ant.coords) is ant:
+            del self.antIndex[ant.coords]
+        return (index, ant)
+
+    ##
+    # change the coords of one of this inventory's ants
+    def moveAnt(self, ant, coords):
+        if self.antIndex != None:
+            if self.antIndex.get(ant.coords) is ant:
+                del self.antIndex[ant.coords]
+            self.antIndex[coords] = ant
+        ant.coords = coords
+
+    ##
+    # add a construction to this inventory
+    def addConstr(self, constr):
+        self.constrs.append(constr)
+        if self.constrIndex != None:
+            self.constrIndex[constr.coords] = constr
+
+    ##
+    # remove a construction from this inventory
+    #
+    # Return: a tuple of its former position in the constrs list and the
+    # construction
+    def removeConstr(self, constr):
+        index = self.constrs.index(constr)
+        del self.constrs[index]
+        if self.constrIndex != None and self.constrIndex.get(constr.coords) is constr:
+            del self.constrIndex[constr.coords]
+        return (index, constr)
 
     ##
     # duplicate this inventory
@@ -1,3 +1,5 @@
+from Building import Building
+
 ##
 #Location
 #Description: This class represents all valid locations on the board
@@ -6,8 +8,12 @@
 #   ant - The ant found at this location
 #   constr - The construction found at this location 
 #   coords - The coordinates of this location
+#
+# Note:  grass and food never change once they are placed so clones share
+# them with the original (see GameState.clone).  Only Buildings are copied.
 ##
 class Location(object):
+    __slots__ = ('ant', 'constr', 'coords')
 
     ##
     #__init__
@@ -28,9 +34,11 @@ class Location(object):
             return self.constr.movementCost
     
     def clone(self):
-        newLoc = Location(self.coords)
-        if self.ant != None:
-            newLoc.ant = self.ant.clone()
-        if self.constr != None:
+        newLoc = Location.__new__(Location)
+        newLoc.coords = self.coords
+        newLoc.ant = None if self.ant is None else self.ant.clone()
+        if type(self.constr) is Building:
             newLoc.constr = self.constr.clone()
+        else:
+            newLoc.constr = self.constr
         return newLoc
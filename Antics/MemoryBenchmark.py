@@ -0,0 +1,161 @@
+import sys
+from Constants import *
+from Ant import Ant
+from Building import Building
+from Construction import Construction
+from Inventory import Inventory
+from Location import Location
+from GameState import GameState
+from CompactState import compactClone
+from Move import Move
+from AIPlayerUtils import getNextState
+from PersistentState import makePersistent
+
+#
+# MemoryBenchmark.py
+#
+# Reports how many bytes each copy of a GameState costs when it is made with
+# GameState.clone, GameState.fastclone and CompactState.compactClone, and how
+# many each child state costs when it is made with AIPlayerUtils.getNextState
+# and PersistentState.nextState.  Run it from this directory with:
+# python MemoryBenchmark.py
+#
+# Only the objects a copy doesn't share with the state it was copied from are
+# counted (coordinate tuples, for instance, are shared) and small ints, bools
+# and None are never counted since the interpreter caches them.
+#
+# Each copy is measured twice:  as it is and as it would be if Ant,
+# Construction, Building, Location, Move and Inventory had no __slots__, with
+# each object counted as an instance with a __dict__ of the same attributes.
+#
+
+##
+# DictBased
+#
+# Description: A class without __slots__, to measure what an instance with a
+# __dict__ costs
+class DictBased(object):
+    pass
+
+##
+# slotNames
+#
+# Return: the names of the slots of an object's class and its bases
+def slotNames(obj):
+    names = []
+    for cls in type(obj).__mro__:
+        names.extend(getattr(cls, '__slots__', ()))
+    return names
+
+##
+# deepSize
+#
+# Description: Adds up sys.getsizeof for an object and everything it refers to
+# (through lists, tuples, dicts, __dict__ and __slots__).
+#
+# Parameters:
+#   obj - the object to measure
+#   seen - a set of the ids of objects that have already been counted (or
+#       that shouldn't be).  It is updated.
+#   withDicts - if True an object with __slots__ is counted as a DictBased
+#       instance with the same attributes
+#
+# Return: the size in bytes
+def deepSize(obj, seen, withDicts = False):
+    if obj is None or isinstance(obj, (bool, int, long, float, str, type)) or id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += deepSize(item, seen, withDicts)
+    elif isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deepSize(key, seen, withDicts) + deepSize(value, seen, withDicts)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deepSize(obj.__dict__, seen, withDicts)
+        names = slotNames(obj)
+        if withDicts and names:
+            fields = {}
+            for name in names:
+                if hasattr(obj, name):
+                    fields[name] = getattr(obj, name)
+            size = sys.getsizeof(DictBased()) + sys.getsizeof(fields)
+        for name in names:
+            size += deepSize(getattr(obj, name, None), seen, withDicts)
+    return size
+
+##
+# copySize
+#
+# Parameters:
+#   withDicts - see deepSize
+#
+# Return: the bytes used by copy that aren't shared with original
+def copySize(original, copy, withDicts = False):
+    seen = set()
+    deepSize(original, seen)
+    return deepSize(copy, seen, withDicts)
+
+##
+# makeSampleState
+#
+# Description: Builds a typical mid-game state:  both players have their
+# anthill, a tunnel, nine grass, a queen, two workers (one carrying food), a
+# drone and a soldier and there are four pieces of food on the board.
+#
+# Return: the GameState (with a board)
+def makeSampleState():
+    board = [[Location((col, row)) for row in xrange(0, BOARD_LENGTH)] for col in xrange(0, BOARD_LENGTH)]
+    inventories = [Inventory(PLAYER_ONE, [], [], 3),
+                   Inventory(PLAYER_TWO, [], [], 2),
+                   Inventory(NEUTRAL, [], [], 0)]
+    for player in (PLAYER_ONE, PLAYER_TWO):
+        #player two's half is player one's half turned around
+        if player == PLAYER_ONE:
+            place = lambda coords: coords
+        else:
+            place = lambda coords: (BOARD_LENGTH - 1 - coords[0], BOARD_LENGTH - 1 - coords[1])
+        inventories[player].constrs.append(Building(place((4, 1)), ANTHILL, player))
+        inventories[player].constrs.append(Building(place((1, 2)), TUNNEL, player))
+        for x in xrange(0, 9):
+            inventories[NEUTRAL].constrs.append(Construction(place((x, 3)), GRASS))
+        for coords in ((2, 7), (7, 7)):
+            inventories[NEUTRAL].constrs.append(Construction(place(coords), FOOD))
+        for coords, antType in (((4, 1), QUEEN), ((2, 5), WORKER), ((3, 2), WORKER),
+                                ((5, 4), DRONE), ((6, 2), SOLDIER)):
+            inventories[player].ants.append(Ant(place(coords), antType, player))
+        inventories[player].ants[2].carrying = True
+    for inv in inventories:
+        for ant in inv.ants:
+            board[ant.coords[0]][ant.coords[1]].ant = ant
+        for constr in inv.constrs:
+            board[constr.coords[0]][constr.coords[1]].constr = constr
+    return GameState(board, inventories, PLAY_PHASE, PLAYER_ONE)
+
+##
+# report
+#
+# Description: Prints the size of a copy with and without __slots__
+#
+# Parameters:
+#   label - the name of the copy routine
+#   original - the state it copied
+#   copy - the copy it made
+def report(label, original, copy):
+    print "  %-13s%9d %9d" % (label + ":", copySize(original, copy, True),
+                              copySize(original, copy))
+
+if __name__ == "__main__":
+    state = makeSampleState()
+    print "bytes per GameState copy"
+    print "  %-13s%9s %9s" % ("", "__dict__", "__slots__")
+    report("clone", state, state.clone())
+    report("fastclone", state, state.fastclone())
+    report("compactClone", state, compactClone(state))
+    move = Move(MOVE_ANT, [(4, 1), (4, 0)], None)
+    root = makePersistent(state)
+    print "bytes per child state (one ant moved)"
+    report("getNextState", state, getNextState(state, move))
+    report("nextState", root, root.nextState(move))
@@ -10,6 +10,7 @@ from Constants import *
 #   buildType - This identifies the type of a unit(only relevant to Moves of type build)
 ##
 class Move(object):
+    __slots__ = ('moveType', 'coordList', 'buildType')
 
     ##
     #__init__
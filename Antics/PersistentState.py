@@ -0,0 +1,102 @@
+from Constants import *
+from Inventory import Inventory
+from GameState import GameState
+from Rules import UNDO_SET, UNDO_CALL
+from AIPlayerUtils import applyMove, undoMove
+
+#
+# PersistentState.py
+#
+# A PersistentState is a GameState (without a board) that shares everything a
+# move didn't change with the state it was made from:  nextState copies only
+# the ants and constructions the move changed and the inventories they are in
+# (an inventory is a list of pointers to its ants and constructions, so this
+# is cheap); every other ant, construction and inventory is the parent's own
+# object.  A search tree of PersistentStates (such as the Monte Carlo agent's)
+# therefore costs memory in proportion to the changes along it rather than a
+# whole state per node.
+#
+# Because of the sharing a PersistentState must never be changed (except by
+# applyMove followed by undoMove, which is how nextState works).  Use
+# fastclone (or AIPlayerUtils.getNextState) to get a state that may be
+# changed freely.
+#
+
+##
+#PersistentState
+#Description: An unchangeable GameState that shares unchanged parts with its
+#   parent (see the notes above).  Make the root of a tree with
+#   makePersistent and the rest with nextState.
+##
+class PersistentState(GameState):
+
+    ##
+    #nextState
+    #Description: Returns the state after a move (made by the rules in
+    #   Rules.py, as AIPlayerUtils.getNextState does).  This state is
+    #   unchanged.
+    #
+    #Parameters:
+    #   move - a legal Move for this state
+    #
+    #Return: a PersistentState
+    ##
+    def nextState(self, move):
+        #make the move here to find out what it changes, copy the results
+        #and then put this state back the way it was
+        record = applyMove(self, move)
+        changed = set()
+        for entry in record:
+            if entry[0] == UNDO_SET:
+                changed.add(id(entry[1]))
+            elif entry[0] == UNDO_CALL:
+                #an inventory's ants or constrs changed
+                changed.add(id(entry[1].__self__))
+
+        inventories = []
+        for inv in self.inventories:
+            inventories.append(shareInventory(inv, changed))
+        child = PersistentState(None, inventories, self.phase, self.whoseTurn)
+        child.hashKey = self.hashKey
+
+        undoMove(self, record)
+        return child
+
+##
+# shareInventory
+#
+# Description: Returns an inventory's contents as a new inventory would need
+# them, reusing the inventory itself if none of it changed.  This is a helper
+# method for PersistentState.nextState.
+#
+# Parameters:
+#   inv - the Inventory (after the move)
+#   changed - the ids of the objects the move changed
+#
+# Return: an Inventory
+def shareInventory(inv, changed):
+    if id(inv) not in changed:
+        for item in inv.ants + inv.constrs:
+            if id(item) in changed:
+                break
+        else:
+            return inv
+    ants = [ant.clone() if id(ant) in changed else ant for ant in inv.ants]
+    constrs = [constr.clone() if id(constr) in changed else constr for constr in inv.constrs]
+    return Inventory(inv.player, ants, constrs, inv.foodCount)
+
+##
+# makePersistent
+#
+# Description: Makes the root of a tree of PersistentStates.  The given state
+# isn't shared with it, so it can still be changed.
+#
+# Parameters:
+#   state - a GameState
+#
+# Return: a PersistentState
+def makePersistent(state):
+    copy = state.fastclone()
+    root = PersistentState(None, copy.inventories, copy.phase, copy.whoseTurn)
+    root.hashKey = copy.hashKey
+    return root
@@ -0,0 +1,442 @@
+from operator import attrgetter
+from Constants import *
+from Inventory import Inventory
+from Location import Location
+from GameState import GameState
+from Zobrist import computeHash
+
+#
+# PerspectiveState.py
+#
+# Presents a GameState the way player two sees it (turned around so that
+# player two's side is on top) without copying or modifying it.  This replaces
+# cloning a state and calling GameState.flipBoard, which reverses every column
+# of the board and rewrites every coordinate, just to hand the state to
+# player two:  here coordinates are translated only when someone asks for
+# them.
+#
+# The ants, constructions, locations and inventories of the viewed state are
+# presented through view objects with the same attributes as the real ones.
+# Each object gets a single view (so comparing views with "is" works as it
+# does for the real objects) and assigning to a view's attributes writes
+# through to the viewed state, except that coords and type are copied when
+# the view is made (they are read far more often than anything else):  ants
+# must be moved with PerspectiveInventory.moveAnt.  The ants and constrs lists
+# of an inventory are copies too, so adding or removing ants and
+# constructions is not supported.  Use clone or fastclone to get an ordinary
+# GameState that can be modified freely (AIPlayerUtils.getNextState already
+# does).
+#
+# Because the coords and types are copied but everything else is read from the
+# viewed state, a view must be made over a state that nobody else changes:
+# Game views a clone of its state for player two, just as it hands player one
+# a clone.
+#
+
+##
+# flipCoords
+#
+# Return: the coordinate as seen from the other side of the board (or None)
+def flipCoords(coords):
+    if coords == None:
+        return None
+    return (BOARD_LENGTH - 1 - coords[0], BOARD_LENGTH - 1 - coords[1])
+
+##
+# flippedCopies
+#
+# Return: a list of clones of the given ants or constructions with their
+# coords flipped
+def flippedCopies(objs):
+    result = []
+    for obj in objs:
+        copy = obj.clone()
+        copy.coords = (BOARD_LENGTH - 1 - copy.coords[0], BOARD_LENGTH - 1 - copy.coords[1])
+        result.append(copy)
+    return result
+
+##
+# passThrough
+#
+# Return: a property that reads and writes the attribute of the same name on
+# the object behind a view
+def passThrough(name):
+    return property(attrgetter('obj.' + name),
+                    lambda self, value: setattr(self.obj, name, value))
+
+
+##
+#PerspectiveAnt
+#Description: Presents an Ant with its coords as seen by player two.
+#
+#Variables:
+#   obj - the Ant being viewed
+#   coords - the ant's coords in player two's coordinates
+#   type - the ant's type
+##
+class PerspectiveAnt(object):
+    __slots__ = ('obj', 'coords', 'type')
+
+    def __init__(self, inputAnt):
+        self.obj = inputAnt
+        self.coords = flipCoords(inputAnt.coords)
+        self.type = inputAnt.type
+
+    player = passThrough('player')
+    health = passThrough('health')
+    carrying = passThrough('carrying')
+    hasMoved = passThrough('hasMoved')
+
+    ##
+    # returns a detached Ant (in player two's coordinates)
+    def clone(self):
+        rtnAnt = self.obj.clone()
+        rtnAnt.coords = self.coords
+        return rtnAnt
+
+
+##
+#PerspectiveConstr
+#Description: Presents a Construction (or Building) with its coords as seen
+#   by player two.  player and captureHealth raise AttributeError for
+#   constructions that don't have them, just like the real object.
+#
+#Variables:
+#   obj - the Construction being viewed
+#   coords - the construction's coords in player two's coordinates
+#   type - the construction's type
+##
+class PerspectiveConstr(object):
+    __slots__ = ('obj', 'coords', 'type')
+
+    def __init__(self, inputConstr):
+        self.obj = inputConstr
+        self.coords = flipCoords(inputConstr.coords)
+        self.type = inputConstr.type
+
+    movementCost = passThrough('movementCost')
+    player = passThrough('player')
+    captureHealth = passThrough('captureHealth')
+
+    ##
+    # returns a detached Construction or Building (in player two's coordinates)
+    def clone(self):
+        rtnConstr = self.obj.clone()
+        rtnConstr.coords = self.coords
+        return rtnConstr
+
+
+##
+#PerspectiveLocation
+#Description: Presents a Location of the viewed board.  The ant and constr
+#   found there are presented through their views.
+#
+#Variables:
+#   state - the PerspectiveState this location belongs to
+#   obj - the Location being viewed
+##
+class PerspectiveLocation(object):
+    __slots__ = ('state', 'obj')
+
+    def __init__(self, inputState, inputLocation):
+        self.state = inputState
+        self.obj = inputLocation
+
+    def _getAnt(self):
+        return self.state.view(self.obj.ant)
+
+    def _setAnt(self, ant):
+        self.obj.ant = getattr(ant, 'obj', ant)
+
+    def _getConstr(self):
+        return self.state.view(self.obj.constr)
+
+    def _setConstr(self, constr):
+        self.obj.constr = getattr(constr, 'obj', constr)
+
+    def _getCoords(self):
+        return flipCoords(self.obj.coords)
+
+    ant = property(_getAnt, _setAnt)
+    constr = property(_getConstr, _setConstr)
+    coords = property(_getCoords)
+
+    def getMoveCost(self):
+        return self.obj.getMoveCost()
+
+    ##
+    # returns a detached Location (in player two's coordinates)
+    def clone(self):
+        newLoc = Location(self._getCoords())
+        if self.obj.ant != None:
+            newLoc.ant = self._getAnt().clone()
+        if self.obj.constr != None:
+            newLoc.constr = self._getConstr().clone()
+        return newLoc
+
+
+##
+#PerspectiveBoard
+#Description: Presents the viewed board so that board[x][y] is the location at
+#   (x, y) in player two's coordinates.
+#
+#Variables:
+#   state - the PerspectiveState this board belongs to
+#   column - the index of the column being presented (None for the whole
+#       board)
+##
+class PerspectiveBoard(object):
+    __slots__ = ('state', 'column')
+
+    def __init__(self, inputState, inputColumn = None):
+        self.state = inputState
+        self.column = inputColumn
+
+    def __len__(self):
+        return BOARD_LENGTH
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += BOARD_LENGTH
+        if not 0 <= i < BOARD_LENGTH:
+            raise IndexError("board index out of range")
+        if self.column == None:
+            return PerspectiveBoard(self.state, i)
+        board = self.state.state.board
+        return self.state.view(board[BOARD_LENGTH - 1 - self.column][BOARD_LENGTH - 1 - i])
+
+    def __iter__(self):
+        for i in xrange(0, BOARD_LENGTH):
+            yield self[i]
+
+
+##
+#PerspectiveInventory
+#Description: Presents an Inventory of the viewed state.  Reading ants or
+#   constrs returns a copy of a list of views that is made the first time.
+#
+#Variables:
+#   state - the PerspectiveState this inventory belongs to
+#   obj - the Inventory being viewed
+#   antViews - the views of the inventory's ants (or None until needed)
+#   constrViews - the views of the inventory's constructions (or None)
+#   antIndex - the views of the ants keyed by their (player two) coords or
+#       None until getAntAt builds it (see Inventory.antIndex)
+#   constrIndex - the same for the constructions
+##
+class PerspectiveInventory(object):
+    __slots__ = ('state', 'obj', 'antViews', 'constrViews', 'antIndex', 'constrIndex')
+
+    def __init__(self, inputState, inputInventory):
+        self.state = inputState
+        self.obj = inputInventory
+        self.antViews = None
+        self.constrViews = None
+        self.antIndex = None
+        self.constrIndex = None
+
+    def _getAnts(self):
+        if self.antViews == None:
+            view = self.state.view
+            self.antViews = [view(ant) for ant in self.obj.ants]
+        return self.antViews[:]
+
+    def _getConstrs(self):
+        if self.constrViews == None:
+            view = self.state.view
+            self.constrViews = [view(constr) for constr in self.obj.constrs]
+        return self.constrViews[:]
+
+    player = passThrough('player')
+    foodCount = passThrough('foodCount')
+    ants = property(_getAnts)
+    constrs = property(_getConstrs)
+
+    ##
+    # return the queen in this inventory
+    def getQueen(self):
+        return self.state.view(self.obj.getQueen())
+
+    ##
+    # return the anthill in this inventory
+    def getAnthill(self):
+        return self.state.view(self.obj.getAnthill())
+
+    ##
+    # construct a list of all the tunnels in this inventory
+    def getTunnels(self):
+        view = self.state.view
+        return [view(tunnel) for tunnel in self.obj.getTunnels()]
+
+    ##
+    # return the ant in this inventory at the given coords (or None)
+    def getAntAt(self, coords):
+        if self.antIndex == None:
+            self.antIndex = {}
+            for ant in self._getAnts():
+                self.antIndex[ant.coords] = ant
+        return self.antIndex.get(coords)
+
+    ##
+    # return the construction in this inventory at the given coords (or None)
+    def getConstrAt(self, coords):
+        if self.constrIndex == None:
+            self.constrIndex = {}
+            for constr in self._getConstrs():
+                self.constrIndex[constr.coords] = constr
+        return self.constrIndex.get(coords)
+
+    ##
+    # see Inventory.clearIndexes
+    def clearIndexes(self):
+        self.antIndex = None
+        self.constrIndex = None
+        self.obj.clearIndexes()
+
+    ##
+    # see Inventory.moveAnt
+    def moveAnt(self, ant, coords):
+        if self.antIndex != None:
+            del self.antIndex[ant.coords]
+            self.antIndex[coords] = ant
+        self.obj.moveAnt(ant.obj, flipCoords(coords))
+        ant.coords = coords
+
+
+##
+#PerspectiveState
+#Description: Presents a GameState from player two's side of the board (see
+#   the top of this file).
+#
+#Variables:
+#   state - the GameState being viewed
+#   board - the PerspectiveBoard presenting state's board (or None if state
+#       has no board)
+#   inventories - the PerspectiveInventory of each of state's inventories
+#   views - the view of each object of state that has been looked at, keyed
+#       by the object's id (the view keeps the object alive so ids can't be
+#       reused)
+#   hashKey - The Zobrist key of the presented state or None if it hasn't
+#       been computed yet (it differs from state's key since the coordinates
+#       differ)
+#   neutralCopies - flipped copies of the grass and food, made by the first
+#       fastclone and shared by all the others (or None)
+##
+class PerspectiveState(object):
+    __slots__ = ('state', 'board', 'inventories', 'views', 'hashKey', 'neutralCopies')
+
+    ##
+    #__init__
+    #Description: Creates a new PerspectiveState
+    #
+    #Parameters:
+    #   inputState - the GameState to present (it is not copied)
+    ##
+    def __init__(self, inputState):
+        self.state = inputState
+        self.views = {}
+        self.hashKey = None
+        self.neutralCopies = None
+        self.board = None if inputState.board is None else PerspectiveBoard(self)
+        self.inventories = tuple(PerspectiveInventory(self, inv) for inv in inputState.inventories)
+
+    ##
+    #view
+    #Description: Returns the view of an Ant, Construction or Location of the
+    #   viewed state (or None if obj is None).
+    ##
+    def view(self, obj):
+        if obj is None:
+            return None
+        rtnView = self.views.get(id(obj))
+        if rtnView is None:
+            if isinstance(obj, Location):
+                rtnView = PerspectiveLocation(self, obj)
+            elif hasattr(obj, 'movementCost'):
+                rtnView = PerspectiveConstr(obj)
+            else:
+                rtnView = PerspectiveAnt(obj)
+            self.views[id(obj)] = rtnView
+        return rtnView
+
+    def _getPhase(self):
+        return self.state.phase
+
+    def _setPhase(self, value):
+        self.state.phase = value
+
+    def _getWhoseTurn(self):
+        return self.state.whoseTurn
+
+    def _setWhoseTurn(self, value):
+        self.state.whoseTurn = value
+
+    phase = property(_getPhase, _setPhase)
+    whoseTurn = property(_getWhoseTurn, _setWhoseTurn)
+
+    ##
+    #getHashKey
+    #Description: see GameState.getHashKey
+    ##
+    def getHashKey(self):
+        if self.hashKey == None:
+            self.hashKey = computeHash(self)
+        return self.hashKey
+
+    ##
+    #updateHash
+    #Description: see GameState.updateHash
+    ##
+    def updateHash(self, delta):
+        if self.hashKey != None:
+            self.hashKey ^= delta
+
+    ##
+    #coordLookup
+    #Description: see GameState.coordLookup
+    ##
+    def coordLookup(self, coords, playerId):
+        if coords == None or playerId == None:
+            return None
+
+        if playerId == PLAYER_ONE:
+            return coords
+        else:
+            return flipCoords(coords)
+
+    ##
+    #clearConstrs
+    #Description: see GameState.clearConstrs (this clears the viewed board)
+    ##
+    def clearConstrs(self):
+        self.state.clearConstrs()
+
+    ##
+    #clone
+    #Description: Returns an ordinary GameState (with a board) identical to
+    #   the presented one
+    ##
+    def clone(self):
+        newState = self.state.clone()
+        newState.flipBoard()
+        newState.hashKey = self.hashKey
+        return newState
+
+    ##
+    #fastclone
+    #Description: Returns an ordinary GameState without a board (see
+    #   GameState.fastclone) identical to the presented one
+    ##
+    def fastclone(self):
+        newInventories = []
+        for inv in self.state.inventories:
+            if inv.player == NEUTRAL:
+                if self.neutralCopies is None:
+                    self.neutralCopies = flippedCopies(inv.constrs)
+                continue
+            newInventories.append(Inventory(inv.player, flippedCopies(inv.ants),
+                                            flippedCopies(inv.constrs), inv.foodCount))
+        newInventories.append(Inventory(NEUTRAL, [], self.neutralCopies[:], 0))
+        newState = GameState(None, newInventories, self.phase, self.whoseTurn)
+        newState.hashKey = self.hashKey
+        return newState
@@ -0,0 +1,269 @@
+from Constants import *
+from Ant import Ant, UNIT_STATS
+from Building import Building
+from Construction import CONSTR_STATS
+from Zobrist import antKey, constrKey, foodKey, turnKey
+
+#
+# Rules.py
+#
+# The rules of the play phase:  what moving an ant, attacking, building and
+# ending the turn do to a state, and who has won.  Game calls these after it
+# has validated a move (and, for attacks, asked the player which ant to
+# attack) and AIPlayerUtils.applyMove calls the same functions during search,
+# so simulated moves have exactly the effect real ones do.  Nothing here is
+# validated or reported to the UI.
+#
+# Each function works on a GameState (with or without a board; the board is
+# kept up to date if there is one) or anything with the same inventories.  The
+# state's Zobrist key is updated if it has been computed (see
+# GameState.updateHash).  If an undo record (a list) is given every change is
+# logged in it so that AIPlayerUtils.undoMove can reverse it.
+#
+
+##
+# Kinds of entries in an undo record (see AIPlayerUtils.applyMove)
+UNDO_SET = 0       #(UNDO_SET, object, attribute name, old value)
+UNDO_CALL = 1      #(UNDO_CALL, function that reverses the change, arguments)
+#notes of what happened, for code that reads a record to find out what a move
+#did (there is nothing to reverse for these)
+ANT_MOVED = 2      #(ANT_MOVED, ant, coords it moved from)
+ANT_REMOVED = 3    #(ANT_REMOVED, ant that died)
+
+##
+# recordSet
+#
+# helper for the rules:  assigns a value to an attribute of an object and
+# logs the old value in the given undo record (if there is one)
+def recordSet(record, obj, attr, value):
+    if record is not None:
+        record.append((UNDO_SET, obj, attr, getattr(obj, attr)))
+    setattr(obj, attr, value)
+
+##
+# recordCall
+#
+# helper for the rules:  logs a call that will reverse a change (such as
+# Inventory.removeAnt after Inventory.addAnt) in the given undo record (if
+# there is one)
+def recordCall(record, function, *args):
+    if record is not None:
+        record.append((UNDO_CALL, function, args))
+
+##
+# recordNote
+#
+# helper for the rules:  logs a note (ANT_MOVED or ANT_REMOVED) in the given
+# undo record (if there is one)
+def recordNote(record, kind, *details):
+    if record is not None:
+        record.append((kind,) + details)
+
+##
+# findConstrAt
+#
+# Return: the construction (of any player) at the given coords or None
+def findConstrAt(state, coords):
+    for inv in state.inventories:
+        constr = inv.getConstrAt(coords)
+        if constr is not None:
+            return constr
+    return None
+
+##
+# listAttackTargets
+#
+# Description: Lists the enemy ants an ant can attack from where it is (the
+# same test as Game.isValidAttack).  Workers never attack.
+#
+# Parameters:
+#   state - the current state
+#   attackingAnt - the ant that would attack
+#
+# Return: a list of Ants, in the order of their inventory
+def listAttackTargets(state, attackingAnt):
+    if attackingAnt.type == WORKER:
+        return []
+    reach = UNIT_STATS[attackingAnt.type][RANGE] ** 2
+    x, y = attackingAnt.coords
+    targets = []
+    for ant in state.inventories[1 - attackingAnt.player].ants:
+        if (ant.coords[0] - x) ** 2 + (ant.coords[1] - y) ** 2 <= reach:
+            targets.append(ant)
+    return targets
+
+##
+# applyAntMove
+#
+# Description: Moves an ant to the end of a MOVE_ANT's path and marks it as
+# having moved.  Any attack it makes is a separate step (see applyAttack).
+#
+# Parameters:
+#   state - the state to modify
+#   move - a legal MOVE_ANT for the player whose turn it is
+#   record - an undo record or None
+#
+# Return: the ant that moved
+def applyAntMove(state, move, record = None):
+    startCoord = tuple(move.coordList[0])
+    endCoord = tuple(move.coordList[-1])
+    myInv = state.inventories[state.whoseTurn]
+    ant = myInv.getAntAt(startCoord)
+    key = state.hashKey
+
+    if key is not None:
+        key ^= antKey(ant)
+    if state.board is not None and endCoord != startCoord:
+        recordSet(record, state.board[startCoord[0]][startCoord[1]], 'ant', None)
+        recordSet(record, state.board[endCoord[0]][endCoord[1]], 'ant', ant)
+    recordCall(record, myInv.moveAnt, ant, ant.coords)
+    recordNote(record, ANT_MOVED, ant, ant.coords)
+    myInv.moveAnt(ant, endCoord)
+    recordSet(record, ant, 'hasMoved', True)
+    if key is not None:
+        recordSet(record, state, 'hashKey', key ^ antKey(ant))
+    return ant
+
+##
+# applyAttack
+#
+# Description: Has one ant attack another, removing the attacked ant if it
+# dies.
+#
+# Parameters:
+#   state - the state to modify
+#   attackingAnt - the ant that attacks
+#   attackedAnt - an enemy ant in range (see listAttackTargets)
+#   record - an undo record or None
+def applyAttack(state, attackingAnt, attackedAnt, record = None):
+    key = state.hashKey
+    if key is not None:
+        key ^= antKey(attackedAnt)
+    recordSet(record, attackedAnt, 'health',
+              attackedAnt.health - UNIT_STATS[attackingAnt.type][ATTACK])
+
+    #remove the attacked ant if it died
+    if attackedAnt.health > 0:
+        if key is not None:
+            key ^= antKey(attackedAnt)
+    else:
+        coords = attackedAnt.coords
+        if state.board is not None:
+            recordSet(record, state.board[coords[0]][coords[1]], 'ant', None)
+        inv = state.inventories[attackedAnt.player]
+        index, removedAnt = inv.removeAnt(attackedAnt)
+        recordCall(record, inv.insertAnt, index, removedAnt)
+        recordNote(record, ANT_REMOVED, removedAnt)
+    if key is not None:
+        recordSet(record, state, 'hashKey', key)
+
+##
+# applyBuild
+#
+# Description: Builds an ant on the anthill (it can't move until next turn) or
+# a tunnel under a worker and pays for it.
+#
+# Parameters:
+#   state - the state to modify
+#   move - a legal BUILD for the player whose turn it is
+#   record - an undo record or None
+def applyBuild(state, move, record = None):
+    coords = tuple(move.coordList[0])
+    me = state.whoseTurn
+    myInv = state.inventories[me]
+    oldFood = myInv.foodCount
+    key = state.hashKey
+
+    if move.buildType == TUNNEL:
+        cost = CONSTR_STATS[TUNNEL][BUILD_COST]
+        tunnel = Building(coords, TUNNEL, me)
+        myInv.addConstr(tunnel)
+        recordCall(record, myInv.removeConstr, tunnel)
+        if state.board is not None:
+            recordSet(record, state.board[coords[0]][coords[1]], 'constr', tunnel)
+        if key is not None:
+            key ^= constrKey(tunnel, me)
+    else:
+        cost = UNIT_STATS[move.buildType][COST]
+        ant = Ant(coords, move.buildType, me)
+        ant.hasMoved = True
+        myInv.addAnt(ant)
+        recordCall(record, myInv.removeAnt, ant)
+        if state.board is not None:
+            recordSet(record, state.board[coords[0]][coords[1]], 'ant', ant)
+        if key is not None:
+            key ^= antKey(ant)
+
+    recordSet(record, myInv, 'foodCount', oldFood - cost)
+    if key is not None:
+        key ^= foodKey(me, oldFood) ^ foodKey(me, myInv.foodCount)
+        recordSet(record, state, 'hashKey', key)
+
+##
+# applyEndTurn
+#
+# Description: Does the end of turn business for the ants of the player whose
+# turn it is and makes it the other player's turn.  For each ant:
+#   - if it stayed on an enemy anthill or tunnel all turn the building loses a
+#     capture point (a tunnel that runs out changes hands)
+#   - a worker on food picks it up
+#   - an ant carrying food onto an anthill or tunnel drops it off
+#   - it may move again
+#
+# Parameters:
+#   state - the state to modify
+#   record - an undo record or None
+def applyEndTurn(state, record = None):
+    me = state.whoseTurn
+    myInv = state.inventories[me]
+    oldFood = myInv.foodCount
+    key = state.hashKey
+
+    for ant in myInv.ants:
+        if key is not None:
+            key ^= antKey(ant)
+        constr = findConstrAt(state, ant.coords)
+        if constr is not None:
+            isBuilding = constr.type == ANTHILL or constr.type == TUNNEL
+            if isBuilding and not ant.hasMoved and constr.player != me:
+                if key is not None:
+                    key ^= constrKey(constr, constr.player)
+                recordSet(record, constr, 'captureHealth', constr.captureHealth - 1)
+                if constr.captureHealth == 0 and constr.type != ANTHILL:
+                    recordSet(record, constr, 'player', me)
+                    recordSet(record, constr, 'captureHealth', CONSTR_STATS[constr.type][CAP_HEALTH])
+                if key is not None:
+                    key ^= constrKey(constr, constr.player)
+            elif constr.type == FOOD and ant.type == WORKER:
+                if not ant.carrying:
+                    recordSet(record, ant, 'carrying', True)
+            elif isBuilding and ant.carrying:
+                recordSet(record, myInv, 'foodCount', myInv.foodCount + 1)
+                recordSet(record, ant, 'carrying', False)
+        if ant.hasMoved:
+            recordSet(record, ant, 'hasMoved', False)
+        if key is not None:
+            key ^= antKey(ant)
+
+    recordSet(record, state, 'whoseTurn', 1 - me)
+    if key is not None:
+        key ^= foodKey(me, oldFood) ^ foodKey(me, myInv.foodCount)
+        key ^= turnKey(me) ^ turnKey(1 - me)
+        recordSet(record, state, 'hashKey', key)
+
+##
+# playerHasWon
+#
+# Parameters:
+#   state - the current state
+#   playerId - The ID of the player being checked for winning (int)
+#
+# Returns: True if the player with playerId has won the game.
+def playerHasWon(state, playerId):
+    if state.phase != PLAY_PHASE:
+        return False
+    opponentInv = state.inventories[1 - playerId]
+    return ((opponentInv.getQueen() == None) or
+            (opponentInv.getAnthill().captureHealth <= 0) or
+            (state.inventories[playerId].foodCount >= FOOD_GOAL) or
+            (opponentInv.foodCount == 0 and len(opponentInv.ants) == 1))
@@ -0,0 +1,153 @@
+#
+# TranspositionTable.py
+#
+# A search often reaches the same state along different paths (moving ant A
+# and then ant B leads to the same state as moving B and then A).  A
+# TranspositionTable remembers what searching a state found, keyed by the
+# state's Zobrist key (see Zobrist.py and GameState.getHashKey), so the
+# search can reuse the result instead of searching the state again.
+#
+# The table has a fixed number of slots and each key can only go in one of
+# them, so a new entry may have to replace an older one (see the REPLACE_*
+# policies).  It keeps counters so its size can be tuned:
+#   probes - how many times lookup was called
+#   hits - lookups that found an entry for the key (deep enough or not)
+#   collisions - lookups that found an entry for a different key in the slot
+#   stores - how many times store was called
+#   replacements - stores that replaced an entry for a different key
+#   rejections - stores that the replacement policy refused
+#
+
+#the kinds of value an entry can hold
+EXACT = 0          #the value of the state
+LOWER_BOUND = 1    #the state is worth at least this much (a beta cutoff)
+UPPER_BOUND = 2    #the state is worth at most this much (nothing beat alpha)
+
+#replacement policies
+REPLACE_ALWAYS = 0 #a new entry always replaces the old one
+REPLACE_DEPTH = 1  #a new entry only replaces one that was searched less
+                   #deeply (or one for the same key)
+
+DEFAULT_TABLE_SIZE = 1 << 16
+
+##
+#TableEntry
+#Description: What was found by searching a state
+#
+#Variables:
+#   key - the state's Zobrist key
+#   depth - how many moves deep the state was searched
+#   value - the value found
+#   bound - EXACT, LOWER_BOUND or UPPER_BOUND
+#   move - the best move found (or None)
+##
+class TableEntry(object):
+    __slots__ = ('key', 'depth', 'value', 'bound', 'move')
+
+    def __init__(self, key, depth, value, bound, move):
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.bound = bound
+        self.move = move
+
+##
+#TranspositionTable
+#Description: A fixed size table of TableEntrys keyed by Zobrist key
+#
+#Variables:
+#   size - the number of slots
+#   policy - the replacement policy (REPLACE_ALWAYS or REPLACE_DEPTH)
+#   slots - a list of the entry in each slot (or None)
+#   probes, hits, collisions, stores, replacements, rejections - the
+#       counters described above
+##
+class TranspositionTable(object):
+
+    ##
+    #__init__
+    #Description: Creates an empty table
+    #
+    #Parameters:
+    #   size - the number of entries the table can hold (int)
+    #   policy - the replacement policy
+    ##
+    def __init__(self, size = DEFAULT_TABLE_SIZE, policy = REPLACE_DEPTH):
+        self.size = size
+        self.policy = policy
+        self.clear()
+
+    ##
+    #clear
+    #Description: Removes every entry and resets the counters
+    ##
+    def clear(self):
+        self.slots = [None] * self.size
+        self.resetCounters()
+
+    ##
+    #resetCounters
+    #Description: Sets every counter back to zero (leaving the entries)
+    ##
+    def resetCounters(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replacements = 0
+        self.rejections = 0
+
+    ##
+    #lookup
+    #Description: Finds the entry for a key
+    #
+    #Parameters:
+    #   key - a Zobrist key
+    #
+    #Return: the TableEntry or None.  The caller decides whether the entry's
+    #   depth and bound make its value usable.
+    ##
+    def lookup(self, key):
+        self.probes += 1
+        entry = self.slots[key % self.size]
+        if entry is None:
+            return None
+        if entry.key != key:
+            self.collisions += 1
+            return None
+        self.hits += 1
+        return entry
+
+    ##
+    #store
+    #Description: Records what searching a state found (if the replacement
+    #   policy allows it)
+    #
+    #Parameters:
+    #   key - the state's Zobrist key
+    #   depth - how many moves deep the state was searched
+    #   value - the value found
+    #   bound - EXACT, LOWER_BOUND or UPPER_BOUND
+    #   move - the best move found (or None)
+    ##
+    def store(self, key, depth, value, bound = EXACT, move = None):
+        self.stores += 1
+        index = key % self.size
+        entry = self.slots[index]
+        if entry is not None and entry.key != key:
+            if self.policy == REPLACE_DEPTH and entry.depth > depth:
+                self.rejections += 1
+                return
+            self.replacements += 1
+        self.slots[index] = TableEntry(key, depth, value, bound, move)
+
+    ##
+    #getCounters
+    #Description: Returns the counters (for reports)
+    #
+    #Return: a dict of each counter keyed by its name
+    ##
+    def getCounters(self):
+        return { 'probes' : self.probes, 'hits' : self.hits,
+                 'collisions' : self.collisions, 'stores' : self.stores,
+                 'replacements' : self.replacements, 'rejections' : self.rejections }
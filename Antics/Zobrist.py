@@ -0,0 +1,121 @@
+import random
+from Constants import *
+
+#
+# Zobrist.py
+#
+# 64-bit Zobrist keys for game states.  Every feature of a state (an ant of a
+# given type/owner/health/carrying/hasMoved on a given cell, a construction of
+# a given type/owner/captureHealth on a given cell, each player's food count,
+# whose turn it is and the phase) has its own random 64-bit number and a
+# state's key is the XOR of the numbers of all its features.  Because XOR is
+# its own inverse a key can be updated incrementally:  XOR out the old key of
+# whatever is about to change and XOR in its new key afterwards.
+#
+# A GameState remembers its key in its hashKey variable (None until someone
+# calls GameState.getHashKey).  Code that modifies a state whose key is known
+# must keep it up to date with GameState.updateHash (see Game.runGame and
+# AIPlayerUtils.applyMove).
+#
+
+#the generator is seeded so that every process computes the same keys
+zobristRandom = random.Random(0x5EED)
+
+def randomKeys(count):
+    return [zobristRandom.getrandbits(64) for i in xrange(0, count)]
+
+NUM_CELLS = BOARD_LENGTH * BOARD_LENGTH
+NUM_ANT_TYPES = R_SOLDIER + 1
+NUM_CONSTR_TYPES = FOOD - ANTHILL + 1
+#ranges of the values that get a key of their own (larger values wrap around)
+HEALTH_RANGE = 16
+CAPTURE_RANGE = 8
+FOOD_RANGE = 64
+
+#keys indexed by [cell][owner * NUM_ANT_TYPES + type] and [cell]
+ANT_KEYS = [randomKeys(2 * NUM_ANT_TYPES) for i in xrange(0, NUM_CELLS)]
+HEALTH_KEYS = [randomKeys(HEALTH_RANGE) for i in xrange(0, NUM_CELLS)]
+CARRYING_KEYS = randomKeys(NUM_CELLS)
+MOVED_KEYS = randomKeys(NUM_CELLS)
+#keys indexed by [cell][owner * NUM_CONSTR_TYPES + type - ANTHILL] and [cell]
+CONSTR_KEYS = [randomKeys(3 * NUM_CONSTR_TYPES) for i in xrange(0, NUM_CELLS)]
+CAPTURE_KEYS = [randomKeys(CAPTURE_RANGE) for i in xrange(0, NUM_CELLS)]
+#keys indexed by [player][foodCount], [whoseTurn] and [phase]
+FOOD_KEYS = [randomKeys(FOOD_RANGE) for i in xrange(0, 2)]
+TURN_KEYS = randomKeys(2)
+PHASE_KEYS = randomKeys(PLAY_PHASE + 1)
+
+##
+# antKey
+#
+# Return: the key of a single ant (with its current coords and stats)
+def antKey(ant):
+    cell = ant.coords[0] * BOARD_LENGTH + ant.coords[1]
+    key = ANT_KEYS[cell][ant.player * NUM_ANT_TYPES + ant.type] ^ \
+          HEALTH_KEYS[cell][ant.health % HEALTH_RANGE]
+    if ant.carrying:
+        key ^= CARRYING_KEYS[cell]
+    if ant.hasMoved:
+        key ^= MOVED_KEYS[cell]
+    return key
+
+##
+# constrKey
+#
+# Parameters:
+#   constr - a Construction or Building
+#   owner - the id of the inventory the construction is in.  This is only
+#       used for constructions that don't have a player variable.
+#
+# Return: the key of a single construction
+def constrKey(constr, owner):
+    cell = constr.coords[0] * BOARD_LENGTH + constr.coords[1]
+    player = getattr(constr, 'player', owner)
+    key = CONSTR_KEYS[cell][player * NUM_CONSTR_TYPES + constr.type - ANTHILL]
+    captureHealth = getattr(constr, 'captureHealth', None)
+    if captureHealth != None:
+        key ^= CAPTURE_KEYS[cell][captureHealth % CAPTURE_RANGE]
+    return key
+
+##
+# foodKey
+#
+# Return: the key of a player having a given amount of food
+def foodKey(player, foodCount):
+    return FOOD_KEYS[player][foodCount % FOOD_RANGE]
+
+##
+# turnKey
+#
+# Return: the key for its being a given player's turn
+def turnKey(whoseTurn):
+    return TURN_KEYS[whoseTurn]
+
+##
+# phaseKey
+#
+# Return: the key for a given phase of the game
+def phaseKey(phase):
+    return PHASE_KEYS[phase]
+
+##
+# computeHash
+#
+# Description: computes the key of an entire state from scratch.  This is
+# only needed once per game (or when a state's key is unknown); after that
+# keys should be updated incrementally.
+#
+# Parameters:
+#   state - a GameState (the board is not used)
+#
+# Return: the state's 64-bit key
+def computeHash(state):
+    key = turnKey(state.whoseTurn) ^ phaseKey(state.phase)
+    for inv in state.inventories:
+        for ant in inv.ants:
+            key ^= antKey(ant)
+        for constr in inv.constrs:
+            key ^= constrKey(constr, inv.player)
+        if inv.player != NEUTRAL:
+            key ^= foodKey(inv.player, inv.foodCount)
+    return key